@@ -27,13 +27,14 @@ from . import i18n
 
 HOME = os.path.expanduser("~")
 VERSION = "0.1.0"
-LOCALE_DIR = i18n.find_locale_dir()
 
 try:
     from .. import APP_NAME
 except ImportError:
     from ... import APP_NAME
 
+LOCALE_DIR = i18n.find_locale_dir(APP_NAME)
+
 gettext.install(APP_NAME, LOCALE_DIR)
 
 class Result:
@@ -123,30 +124,126 @@ class _OperationsMixin:
     def suggests(self, suggestion):
         return self.ecode & suggestion != 0
 
+# resource usage of an external command (times in seconds, max_rss in kilobytes)
+CmdStats = collections.namedtuple("CmdStats", ["pid", "wall_time", "user_time", "sys_time", "max_rss"])
+
+_BYTES_TYPES = (bytes, bytearray, memoryview)
+
+def _as_text(output):
+    # output held in other forms (e.g. runext.SpilledOutput) converts via str()
+    return output if isinstance(output, (str,) + _BYTES_TYPES) else str(output)
+
+def _for_display(output):
+    # NB: the repr() of output held in other forms is a short summary
+    return output if isinstance(output, (str,) + _BYTES_TYPES) else repr(output)
+
 # result of running and external command
 class CmdResult(collections.namedtuple("CmdResult", ["ecode", "stdout", "stderr"]), Result, _OperationsMixin):
+    # a CmdStats when the result comes from a command run by runext
+    stats = None
+    # indices of the fields holding bytes that are to be decoded on first use
+    _undecoded = ()
+    @classmethod
+    def undecoded(cls, ecode, stdout, stderr, decode_stdout=True):
+        """Return a result holding the (bytes or memoryview) "stdout"
+        and "stderr" as they are with decoding deferred until (and
+        unless) they're used.
+        """
+        result = cls(ecode, stdout, stderr)
+        result._undecoded = tuple(index for index, decode in ((1, decode_stdout), (2, True)) if decode and isinstance(result._raw(index), _BYTES_TYPES))
+        return result
+    def decoded(self):
+        """Return an equivalent result with any undecoded output decoded."""
+        if not self._undecoded:
+            return self
+        result = self.__class__(self.ecode, self.stdout, self.stderr)
+        if self.stats is not None:
+            result.stats = self.stats
+        return result
+    def _raw(self, index):
+        return tuple.__getitem__(self, index)
+    def _decoded(self, index):
+        if index not in self._undecoded:
+            return tuple.__getitem__(self, index)
+        cache = self.__dict__.setdefault("_decoded_cache", {})
+        try:
+            return cache[index]
+        except KeyError:
+            text = cache[index] = str(self._raw(index), "utf-8")
+            return text
+    @property
+    def stdout(self):
+        return self._decoded(1)
+    @property
+    def stderr(self):
+        return self._decoded(2)
+    def __getitem__(self, index):
+        if not self._undecoded:
+            return tuple.__getitem__(self, index)
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        return self._decoded(range(3)[index])
+    def __iter__(self):
+        if not self._undecoded:
+            return tuple.__iter__(self)
+        return iter((self.ecode, self.stdout, self.stderr))
+    def _comparable(self):
+        # undecodable output compares (and hashes) as the raw bytes
+        try:
+            return tuple(self)
+        except UnicodeDecodeError:
+            return tuple(bytes(item) if isinstance(item, memoryview) else item for item in tuple.__iter__(self))
+    def __eq__(self, other):
+        if not self._undecoded and not getattr(other, "_undecoded", None):
+            return tuple.__eq__(self, other)
+        if not isinstance(other, tuple):
+            return NotImplemented
+        return self._comparable() == (other._comparable() if isinstance(other, CmdResult) else tuple(other))
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+    def __hash__(self):
+        return hash(self._comparable())
+    def __repr__(self):
+        return "CmdResult(ecode={0!r}, stdout={1!r}, stderr={2!r})".format(self.ecode, self.stdout, self.stderr)
     def __str__(self):
-        return "CmdResult(ecode={0:b}, stdout={1}, stderr={2})".format(self.ecode, self.stdout, self.stderr)
+        return "CmdResult(ecode={0:b}, stdout={1}, stderr={2})".format(self.ecode, _for_display(self.stdout), _for_display(self.stderr))
+    def _derived(self, ecode):
+        # NB: the payloads (and anything decoded from them) are shared
+        result = self.__class__(ecode, self._raw(1), self._raw(2))
+        if self._undecoded:
+            result._undecoded = self._undecoded
+            result.__dict__["_decoded_cache"] = self.__dict__.setdefault("_decoded_cache", {})
+        if self.stats is not None:
+            result.stats = self.stats
+        return result
     def __or__(self, suggestions):
         assert suggestions & Suggestion.ALL == suggestions
-        return self.__class__(self.ecode | suggestions, self.stdout, self.stderr)
+        return self._derived(self.ecode | suggestions)
     def __sub__(self, suggestions):
         assert suggestions & Suggestion.ALL == suggestions
-        return self.__class__(self.ecode & ~suggestions, self.stdout, self.stderr)
+        return self._derived(self.ecode & ~suggestions)
     def mapped_for_warning(self, sanitize_stderr=None):
         if self.ecode == 0:
-            if (self.stderr if sanitize_stderr is None else sanitize_stderr(self.stderr)):
-                return self.__class__(Result.WARNING, self.stdout, self.stderr)
+            if (self._raw(2) if sanitize_stderr is None else sanitize_stderr(self.stderr)):
+                return self._derived(Result.WARNING)
             else:
-                return self.__class__(Result.OK, self.stdout, self.stderr)
+                return self._derived(Result.OK)
         else:
-            return self.__class__(Result.ERROR, self.stdout, self.stderr)
+            return self._derived(Result.ERROR)
     def mapped_for_suggestions(self, suggestion_table):
         ecode = self.ecode
         for suggestion, criteria in suggestion_table:
             if criteria(self):
                 ecode |= suggestion
-        return self.__class__(ecode, self.stdout, self.stderr)
+        return self._derived(ecode)
+    @classmethod
+    def combine(cls, results, max_text=None):
+        """Return a single result combining "results" (see ResultAccumulator)."""
+        accumulator = ResultAccumulator(max_text)
+        for result in results:
+            accumulator.add(result)
+        return accumulator.result()
     @classmethod
     def ok(cls, stdout="", stderr=""):
         return cls(Result.OK, stdout, stderr)
@@ -159,7 +256,8 @@ class CmdResult(collections.namedtuple("CmdResult", ["ecode", "stdout", "stderr"
     @property
     def message(self):
         if self.stdout:
-            return "\n".join([self.stdout, self.stderr]) if self.stderr else self.stdout
+            stdout = _as_text(self.stdout)
+            return "\n".join([stdout, self.stderr]) if self.stderr else stdout
         else:
             return self.stderr
 
@@ -183,9 +281,101 @@ class ActionResult(collections.namedtuple("ActionResult", ["ecode", "message"]),
     def error(cls, message=""):
         return cls(Result.ERROR, message)
 
+class _TextAccumulator:
+    def __init__(self, max_text):
+        self._parts = []
+        self._size = 0
+        self._max_text = max_text
+        self.dropped_count = 0
+        self.dropped_size = 0
+
+    def add(self, text):
+        if not text:
+            return
+        if self._max_text is not None and self._size + len(text) > self._max_text:
+            self.dropped_count += 1
+            self.dropped_size += len(text)
+            return
+        self._parts.append(text)
+        self._size += len(text)
+
+    def getvalue(self):
+        if any(isinstance(part, _BYTES_TYPES) for part in self._parts):
+            return b"".join(part.encode() if isinstance(part, str) else bytes(part) for part in self._parts)
+        return "".join(str(part) for part in self._parts)
+
+class ResultAccumulator:
+    """Combine any number of CmdResult and/or ActionResult objects.  The
+    combined ecode has the worst severity and all the suggestions of
+    those added, their text is concatenated (an ActionResult's message
+    counts as stdout if it's OK and stderr otherwise) and each (item,
+    result) pair is kept in "outcomes".  If "max_text" is not None,
+    messages that would take stdout or stderr beyond that many
+    characters are dropped and a summary of those dropped is appended
+    to stderr.
+    """
+    def __init__(self, max_text=None):
+        self._severity = Result.OK
+        self._suggestions = 0
+        self._stdout = _TextAccumulator(max_text)
+        self._stderr = _TextAccumulator(max_text)
+        self.outcomes = []
+
+    def add(self, result, item=None):
+        self._severity = max(self._severity, result.ecode & Result.MASK)
+        self._suggestions |= result.ecode & Suggestion.ALL
+        if isinstance(result, ActionResult):
+            (self._stdout if result.is_ok else self._stderr).add(result.message)
+        else:
+            self._stdout.add(result.stdout)
+            self._stderr.add(result.stderr)
+        self.outcomes.append((item, result))
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    @property
+    def failures(self):
+        return [(item, result) for item, result in self.outcomes if result.ecode & Result.MASK != Result.OK]
+
+    @property
+    def ecode(self):
+        return self._severity | self._suggestions
+
+    @property
+    def stdout(self):
+        return self._stdout.getvalue()
+
+    @property
+    def stderr(self):
+        stderr = self._stderr.getvalue()
+        for what, text in ((_("output"), self._stdout), (_("error"), self._stderr)):
+            if text.dropped_count:
+                stderr += _("... {0} further {1} message(s) ({2} characters) omitted.\n").format(text.dropped_count, what, text.dropped_size)
+        return stderr
+
+    @property
+    def message(self):
+        return self.result().message
+
+    def result(self):
+        return CmdResult(self.ecode, self.stdout, self.stderr)
+
+    def action_result(self):
+        return ActionResult(self.ecode, self.message)
+
 class CmdFailure(Exception):
     def __init__(self, result):
         self.result = result
 
-# import some modules
-from . import options
+# submodules are imported when they're first used
+_SUBMODULES = frozenset(["decorators", "enotify", "i18n", "inotify", "mathx", "nmd_tuples", "options", "os_utils", "picklex", "runext", "str_utils", "utils"])
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        import importlib
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
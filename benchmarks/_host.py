@@ -0,0 +1,42 @@
+### Copyright (C) 2026 The pysm_bab contributors
+###
+### This program is free software; you can redistribute it and/or modify
+### it under the terms of the GNU General Public License as published by
+### the Free Software Foundation; version 2 of the License only.
+###
+### This program is distributed in the hope that it will be useful,
+### but WITHOUT ANY WARRANTY; without even the implied warranty of
+### MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+### GNU General Public License for more details.
+###
+### You should have received a copy of the GNU General Public License
+### along with this program; if not, write to the Free Software
+### Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""The package expects to be embedded in an application's package (which
+supplies APP_NAME, CONFIG_DIR_PATH and PGND_CONFIG_DIR_PATH) so the
+benchmarks build a minimal host application package around it.
+"""
+
+import os
+import tempfile
+
+HOST_NAME = "bab_benchmark_host"
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_HOST_INIT = """APP_NAME = "bab-benchmark"
+CONFIG_DIR_PATH = None
+PGND_CONFIG_DIR_PATH = None
+"""
+
+def make_host_dir():
+    """Return a (temporary) directory which, when on sys.path, makes
+    the package importable as bab_benchmark_host.bab
+    """
+    host_dir = tempfile.mkdtemp(prefix="bab-benchmark-")
+    package_dir = os.path.join(host_dir, HOST_NAME)
+    os.mkdir(package_dir)
+    with open(os.path.join(package_dir, "__init__.py"), "w") as f_obj:
+        f_obj.write(_HOST_INIT)
+    os.symlink(PACKAGE_DIR, os.path.join(package_dir, "bab"))
+    return host_dir
@@ -0,0 +1,90 @@
+### Copyright (C) 2026 The pysm_bab contributors
+###
+### This program is free software; you can redistribute it and/or modify
+### it under the terms of the GNU General Public License as published by
+### the Free Software Foundation; version 2 of the License only.
+###
+### This program is distributed in the hope that it will be useful,
+### but WITHOUT ANY WARRANTY; without even the implied warranty of
+### MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+### GNU General Public License for more details.
+###
+### You should have received a copy of the GNU General Public License
+### along with this program; if not, write to the Free Software
+### Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Compare enotify's dispatch and teardown times with those of the
+original single list registry as the number of callbacks grows.  The
+callbacks are spread over 16 event flags and each notification is for
+one of them.  Dispatch is timed after a notification of each flag as
+enotify caches the ordered callbacks for each events value until the
+next registration or cancellation.
+
+Usage: python benchmarks/enotify_dispatch.py [COUNT ...]
+"""
+
+import random
+import shutil
+import sys
+import time
+
+import _host
+
+class LegacyRegistry:
+    """The original registry: a list of (events, callback) tokens."""
+    def __init__(self):
+        self._cbs = []
+
+    def add_notification_cb(self, events, callback):
+        cb_token = (events, callback)
+        self._cbs.append(cb_token)
+        return cb_token
+
+    def del_notification_cb(self, cb_token):
+        try:
+            del self._cbs[self._cbs.index(cb_token)]
+        except ValueError:
+            pass
+
+    def notify_events(self, events, **kwargs):
+        for registered_events, callback in self._cbs:
+            if registered_events & events:
+                callback(**kwargs)
+
+def _make_callback():
+    # a distinct function object for each registration
+    return lambda **kwargs: None
+
+def measure(registry, flags, count, repeats):
+    """Return (seconds per notification, seconds to delete them all)."""
+    tokens = [registry.add_notification_cb(flags[index % len(flags)], _make_callback()) for index in range(count)]
+    for flag in flags:
+        registry.notify_events(flag)
+    start = time.perf_counter()
+    for index in range(repeats):
+        registry.notify_events(flags[index % len(flags)])
+    dispatch = (time.perf_counter() - start) / repeats
+    random.Random(count).shuffle(tokens)
+    start = time.perf_counter()
+    for token in tokens:
+        registry.del_notification_cb(token)
+    teardown = time.perf_counter() - start
+    return dispatch, teardown
+
+def main(counts):
+    host_dir = _host.make_host_dir()
+    try:
+        sys.path.insert(0, host_dir)
+        from bab_benchmark_host.bab import enotify
+        flags = enotify.new_event_flags_and_mask(16)[:-1]
+        print("{0:>8} {1:>16} {2:>16} {3:>16} {4:>16}".format("count", "legacy notify", "enotify notify", "legacy teardown", "enotify teardown"))
+        for count in counts:
+            repeats = max(160, 100000 // count)
+            legacy = measure(LegacyRegistry(), flags, count, repeats)
+            current = measure(enotify, flags, count, repeats)
+            print("{0:>8} {1:>13.2f} us {2:>13.2f} us {3:>13.2f} ms {4:>13.2f} ms".format(count, legacy[0] * 1e6, current[0] * 1e6, legacy[1] * 1e3, current[1] * 1e3))
+    finally:
+        shutil.rmtree(host_dir)
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 1000, 10000])
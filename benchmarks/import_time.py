@@ -0,0 +1,65 @@
+### Copyright (C) 2026 The pysm_bab contributors
+###
+### This program is free software; you can redistribute it and/or modify
+### it under the terms of the GNU General Public License as published by
+### the Free Software Foundation; version 2 of the License only.
+###
+### This program is distributed in the hope that it will be useful,
+### but WITHOUT ANY WARRANTY; without even the implied warranty of
+### MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+### GNU General Public License for more details.
+###
+### You should have received a copy of the GNU General Public License
+### along with this program; if not, write to the Free Software
+### Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Measure (with python -X importtime) the time taken to import the
+package in a fresh interpreter, both with an empty cache directory (so
+that the locale directory search is done and its result cached) and
+with the cache left by the previous run.  The median cumulative import
+time over the repeats is reported for each.
+
+Usage: python benchmarks/import_time.py [REPEATS]
+"""
+
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import _host
+
+MODULE = _host.HOST_NAME + ".bab"
+
+def import_time(host_dir, cache_dir):
+    """Return the cumulative time (in microseconds) taken to import MODULE."""
+    env = dict(os.environ, PYTHONPATH=host_dir, XDG_CACHE_HOME=cache_dir)
+    env.pop("BAB_BENCHMARK_LOCALE_DIR", None)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + MODULE], env=env, stderr=subprocess.PIPE, check=True, universal_newlines=True)
+    for line in proc.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == MODULE:
+            return int(fields[1])
+    raise ValueError("no import time reported for " + MODULE)
+
+def main(repeats):
+    host_dir = _host.make_host_dir()
+    try:
+        cold = []
+        warm = []
+        for _ in range(repeats):
+            cache_dir = tempfile.mkdtemp(prefix="bab-benchmark-cache-")
+            try:
+                cold.append(import_time(host_dir, cache_dir))
+                warm.append(import_time(host_dir, cache_dir))
+            finally:
+                shutil.rmtree(cache_dir)
+        print("{0:>12} {1:>12}".format("cold cache", "warm cache"))
+        print("{0:>9.2f} ms {1:>9.2f} ms".format(statistics.median(cold) / 1e3, statistics.median(warm) / 1e3))
+    finally:
+        shutil.rmtree(host_dir)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
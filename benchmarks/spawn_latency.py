@@ -0,0 +1,71 @@
+### Copyright (C) 2026 The pysm_bab contributors
+###
+### This program is free software; you can redistribute it and/or modify
+### it under the terms of the GNU General Public License as published by
+### the Free Software Foundation; version 2 of the License only.
+###
+### This program is distributed in the hope that it will be useful,
+### but WITHOUT ANY WARRANTY; without even the implied warranty of
+### MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+### GNU General Public License for more details.
+###
+### You should have received a copy of the GNU General Public License
+### along with this program; if not, write to the Free Software
+### Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Compare the time taken by each spawn backend to run a trivial
+command as the resident set size of the parent grows.  The parent's
+RSS is grown by allocating (and touching every page of) a ballast of
+the given number of MiB.  The median latency over the repeats is
+reported for each backend and ballast size.
+
+Usage: python benchmarks/spawn_latency.py [MIB ...]
+"""
+
+import resource
+import shutil
+import statistics
+import sys
+import time
+
+import _host
+
+PAGE_SIZE = resource.getpagesize()
+
+def make_ballast(mib):
+    """Return a bytearray of "mib" MiB with every page touched."""
+    ballast = bytearray(mib << 20)
+    ballast[::PAGE_SIZE] = b"\x01" * len(range(0, len(ballast), PAGE_SIZE))
+    return ballast
+
+def measure(runext, backend, repeats):
+    """Return the median seconds taken to run "true" with "backend"."""
+    runext.set_spawn_backend(backend)
+    runext.run_cmd(["true"])
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        runext.run_cmd(["true"])
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies)
+
+def main(sizes, repeats=50):
+    host_dir = _host.make_host_dir()
+    try:
+        sys.path.insert(0, host_dir)
+        from bab_benchmark_host.bab import runext
+        backends = [runext.SPAWN_SUBPROCESS, runext.SPAWN_POSIX_SPAWN, runext.SPAWN_FORKSERVER]
+        # start the fork server while we're small (as an application would)
+        measure(runext, runext.SPAWN_FORKSERVER, 1)
+        print("{0:>10} {1:>10}".format("ballast", "max rss") + "".join(" {0:>14}".format(backend) for backend in backends))
+        for mib in sizes:
+            ballast = make_ballast(mib)
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss >> 10
+            latencies = [measure(runext, backend, repeats) for backend in backends]
+            print("{0:>6} MiB {1:>6} MiB".format(mib, max_rss) + "".join(" {0:>11.3f} ms".format(latency * 1e3) for latency in latencies))
+            del ballast
+    finally:
+        shutil.rmtree(host_dir)
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [0, 256, 1024, 2048])
@@ -17,6 +17,13 @@
 them to update their displayed/cached data.
 """
 
+import collections
+import itertools
+import sys
+import threading
+import time
+import weakref
+
 from . import utils
 
 _flag_generator = utils.create_flag_generator()
@@ -47,20 +54,86 @@ def new_event_flag():
 E_CHANGE_WD = new_event_flag()
 """Event flag to notify a change of working directory."""
 
-_NOTIFICATION_CBS = []
+# serials of registrations whose (weakly referenced) owners have been
+# garbage collected: they're purged the next time the registry is used
+# as the garbage collector may run while we're in the middle of using it
+_DEAD_SERIALS = collections.deque()
+
+class _Registration:
+    """A registered callback (and the token used to cancel it)."""
+    __slots__ = ("serial", "events", "_callback", "is_weak", "priority", "synchronous", "active")
+    def __init__(self, serial, events, callback, priority=0, synchronous=False, weak=False):
+        self.serial = serial
+        self.events = events
+        self.is_weak = weak
+        self._callback = weakref.WeakMethod(callback, lambda _ref: _DEAD_SERIALS.append(serial)) if weak else callback
+        self.priority = priority
+        self.synchronous = synchronous
+        self.active = True
+
+    @property
+    def callback(self):
+        """The callback or None if its owner has been garbage collected."""
+        return self._callback() if self.is_weak else self._callback
+
+    @property
+    def order_key(self):
+        return (-self.priority, self.serial)
+
+    def __repr__(self):
+        return "_Registration({0}, {1:b}, {2!r})".format(self.serial, self.events, self.callback)
+
+def _iter_flags(events):
+    while events:
+        flag = events & -events
+        yield flag
+        events ^= flag
+
+# Registrations are kept in a bucket for each flag (in registration order)
+# so that notification only visits interested callbacks and cancellation
+# is O(1) per flag.
+_REGISTRATIONS = {}
+_BUCKETS = {}
+_REGISTRY_LOCK = threading.RLock()
+# ordered registrations for each events value notified since the last
+# registration or cancellation (so that most notifications don't sort)
+_ORDERED_CACHE = {}
+_ORDERED_CACHE_SIZE = 256
+_serial_generator = itertools.count()
 
-def add_notification_cb(events, callback):
+def _is_bound_method(callback):
+    return getattr(callback, "__self__", None) is not None and hasattr(callback, "__func__")
+
+def _purge_dead_registrations():
+    # NB: the caller must hold _REGISTRY_LOCK
+    while _DEAD_SERIALS:
+        registration = _REGISTRATIONS.get(_DEAD_SERIALS.popleft())
+        if registration is not None:
+            _del_registration(registration)
+
+def add_notification_cb(events, callback, priority=0, synchronous=False, weak=False):
     """Register a callback for notification of the specified events.
 
     Arguments:
     events   -- the set of events for which the callback should be called.
     callback -- the procedure to be called.
+    priority -- callbacks with higher priority are called first.
+    synchronous -- always call on the notifying thread even if a
+                dispatcher (see set_dispatcher()) is in use.
+    weak     -- only hold a weak reference to the object that the (bound
+                method) callback belongs to and cancel the registration
+                when that object is garbage collected.
 
     Return a token that identifies the callback to facilitate deletion.
     """
-    cb_token = (events, callback)
-    _NOTIFICATION_CBS.append(cb_token)
-    return cb_token
+    with _REGISTRY_LOCK:
+        _purge_dead_registrations()
+        registration = _Registration(next(_serial_generator), events, callback, priority, synchronous, weak)
+        _REGISTRATIONS[registration.serial] = registration
+        _ORDERED_CACHE.clear()
+        for flag in _iter_flags(events):
+            _BUCKETS.setdefault(flag, {})[registration.serial] = registration
+    return registration
 
 
 def del_notification_cb(cb_token):
@@ -71,11 +144,353 @@ def del_notification_cb(cb_token):
     """
     # this may have already been done as there are two invocation
     # paths - so we need to check
+    with _REGISTRY_LOCK:
+        _purge_dead_registrations()
+        if cb_token.active:
+            _del_registration(cb_token)
+
+def _del_registration(registration):
+    # NB: the caller must hold _REGISTRY_LOCK
+    registration.active = False
+    del _REGISTRATIONS[registration.serial]
+    _ORDERED_CACHE.clear()
+    for flag in _iter_flags(registration.events):
+        bucket = _BUCKETS[flag]
+        del bucket[registration.serial]
+        if not bucket:
+            del _BUCKETS[flag]
+
+RegistrationCounts = collections.namedtuple("RegistrationCounts", ["total", "weak", "by_flag"])
+
+def get_registration_counts():
+    """Return the number of live registrations, how many of those are
+    weak and a dictionary of the number interested in each event flag.
+    """
+    with _REGISTRY_LOCK:
+        _purge_dead_registrations()
+        weak = sum(1 for registration in _REGISTRATIONS.values() if registration.is_weak)
+        by_flag = {flag: len(bucket) for flag, bucket in _BUCKETS.items()}
+        return RegistrationCounts(len(_REGISTRATIONS), weak, by_flag)
+
+def _get_registrations(events):
+    """Return the registrations interested in "events" in priority
+    order (and, within a priority, the order in which they were
+    registered).
+    """
+    with _REGISTRY_LOCK:
+        _purge_dead_registrations()
+        try:
+            return _ORDERED_CACHE[events]
+        except KeyError:
+            pass
+        buckets = [_BUCKETS[flag] for flag in _iter_flags(events) if flag in _BUCKETS]
+        if len(buckets) == 1:
+            registrations = list(buckets[0].values())
+        else:
+            merged = {}
+            for bucket in buckets:
+                merged.update(bucket)
+            registrations = list(merged.values())
+        registrations.sort(key=lambda registration: registration.order_key)
+        if len(_ORDERED_CACHE) >= _ORDERED_CACHE_SIZE:
+            _ORDERED_CACHE.clear()
+        # NB: a tuple so that callers get an immutable snapshot
+        registrations = _ORDERED_CACHE[events] = tuple(registrations)
+        return registrations
+
+def _report_exception(registration, kwargs, edata):
+    print("WS NOTIFY:\t edata: {}\n\t\t callback: {}\n\t\t kwargs: {}".format(edata, registration.callback, kwargs))
+
+_exception_handler = _report_exception
+
+def set_exception_handler(handler):
+    """Set the procedure called (with the registration token, the kwargs
+    and the exception) to report an exception raised by a callback and
+    return the previous one.  Pass None to restore the default (which
+    prints a report).
+    """
+    global _exception_handler
+    old_handler = _exception_handler
+    _exception_handler = _report_exception if handler is None else handler
+    return old_handler
+
+def _callback_name(callback):
+    name = "{0}.{1}".format(getattr(callback, "__module__", "?"), getattr(callback, "__qualname__", repr(callback)))
+    code = getattr(callback, "__code__", None)
+    if code is not None and code.co_name == "<lambda>":
+        name += ":{0}".format(code.co_firstlineno)
+    return name
+
+class CallbackProfile:
+    """Process wide record of the time spent in each callback (by name)
+    and for each event flag (by the flags each callback is registered
+    for).  The last "window" times for each callback are kept for
+    calculating percentiles and calls taking longer than "threshold"
+    seconds are passed to "report_slow" (with the callback's name, its
+    events and the time taken).  Recording only happens while "enabled"
+    is True.
+    """
+    def __init__(self, window=256, threshold=0.05):
+        self.enabled = False
+        self.window = window
+        self.threshold = threshold
+        self.report_slow = self._print_slow
+        self._callbacks = {}
+        self._flags = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _print_slow(name, events, elapsed):
+        sys.stderr.write("WS NOTIFY:\t slow callback: {0} ({1:b}) took {2:.3f}s\n".format(name, events, elapsed))
+
+    def record(self, callback, events, elapsed):
+        name = _callback_name(callback)
+        with self._lock:
+            record = self._callbacks.get(name)
+            if record is None:
+                record = self._callbacks[name] = {"count": 0, "total": 0.0, "max": 0.0, "recent": collections.deque(maxlen=self.window)}
+            record["count"] += 1
+            record["total"] += elapsed
+            record["max"] = max(record["max"], elapsed)
+            record["recent"].append(elapsed)
+            for flag in _iter_flags(events):
+                flag_record = self._flags.get(flag)
+                if flag_record is None:
+                    flag_record = self._flags[flag] = {"count": 0, "total": 0.0, "max": 0.0}
+                flag_record["count"] += 1
+                flag_record["total"] += elapsed
+                flag_record["max"] = max(flag_record["max"], elapsed)
+        if self.threshold is not None and elapsed > self.threshold:
+            self.report_slow(name, events, elapsed)
+
+    @staticmethod
+    def _percentile(ordered, percent):
+        return ordered[min(int(len(ordered) * percent / 100.0), len(ordered) - 1)]
+
+    def snapshot(self):
+        """Return a dictionary with (JSON friendly) "callbacks" and
+        "flags" dictionaries of the recorded times.
+        """
+        with self._lock:
+            callbacks = {}
+            for name, record in self._callbacks.items():
+                ordered = sorted(record["recent"])
+                callbacks[name] = {
+                    "count": record["count"],
+                    "total": record["total"],
+                    "max": record["max"],
+                    "p50": self._percentile(ordered, 50),
+                    "p90": self._percentile(ordered, 90),
+                    "p99": self._percentile(ordered, 99),
+                }
+            flags = {str(flag): dict(record) for flag, record in self._flags.items()}
+        return {"callbacks": callbacks, "flags": flags}
+
+    def dump_json(self, file_path):
+        import json
+        with open(file_path, "w") as fobj:
+            json.dump(self.snapshot(), fobj, indent=2, sort_keys=True)
+
+    def clear(self):
+        with self._lock:
+            self._callbacks = {}
+            self._flags = {}
+
+CALLBACK_PROFILE = CallbackProfile()
+
+def _call(registration, events, kwargs, reraise=True):
+    # NB: this is registration.callback inlined as this is a hot path
+    callback = registration._callback() if registration.is_weak else registration._callback
+    if callback is None:
+        # its owner has gone away
+        del_notification_cb(registration)
+        return
+    start = time.perf_counter() if CALLBACK_PROFILE.enabled else None
     try:
-        index = _NOTIFICATION_CBS.index(cb_token)
-        del _NOTIFICATION_CBS[index]
-    except ValueError:
-        pass
+        callback(**kwargs)
+    except Exception as edata:
+        # TODO: try to be more explicit in naming exception type to catch here
+        # this is done to catch the race between a caller has going away and deleting its notifications
+        if True: # NB: for debug assistance e.g . locating exceptions not due to caller going away
+            _exception_handler(registration, kwargs, edata)
+            # there's nobody to raise it to when called via a dispatcher
+            if reraise:
+                raise edata
+            return
+        del_notification_cb(registration)
+    finally:
+        if start is not None:
+            # NB: only the flags that were notified are charged
+            CALLBACK_PROFILE.record(callback, registration.events & events, time.perf_counter() - start)
+
+class Dispatcher:
+    """Run callbacks (other than those registered as synchronous) via
+    "submit" so that they are kept off the notifying thread.  "submit"
+    is called with a callable (taking no arguments) and may be (e.g.)
+    an executor's submit(), an asyncio loop's call_soon_threadsafe() or
+    GLib.idle_add().  Notifications for a callback that arrive before
+    it has been run are coalesced (as for batched) so that it is called
+    once and callbacks are called in priority order.  Exceptions raised
+    by callbacks are reported via the exception handler (see
+    set_exception_handler()).
+    """
+    def __init__(self, submit):
+        self._submit = submit
+        self._pending = {}
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def queue(self, registration, events, kwargs):
+        with self._lock:
+            entry = self._pending.get(registration.serial)
+            if entry is None:
+                self._pending[registration.serial] = [registration, events, [kwargs]]
+            else:
+                entry[1] |= events
+                entry[2].append(kwargs)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._submit(self._run)
+
+    def _run(self):
+        # only one run at a time (even with a multi threaded executor)
+        # so that a callback's calls are made in notification order
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if not pending:
+                    self._scheduled = False
+                    return
+            for registration, events, kwargs_list in sorted(pending.values(), key=lambda entry: entry[0].order_key):
+                if registration.active:
+                    _call(registration, events, _merge_kwargs(kwargs_list), reraise=False)
+
+_dispatcher = None
+
+def set_dispatcher(dispatcher):
+    """Set the Dispatcher to be used for (non synchronous) callbacks and
+    return the previous one.  Pass None to have all callbacks called on
+    the notifying thread.
+    """
+    global _dispatcher
+    old_dispatcher = _dispatcher
+    _dispatcher = dispatcher
+    return old_dispatcher
+
+def _invoke(registration, events, kwargs):
+    dispatcher = _dispatcher
+    if dispatcher is None or registration.synchronous:
+        _call(registration, events, kwargs)
+    else:
+        dispatcher.queue(registration, events, kwargs)
+
+def _dispatch(events, kwargs):
+    # NB: we work from a snapshot so callbacks may be added or deleted
+    # by callbacks (and those deleted will not be called)
+    dispatcher = _dispatcher
+    for registration in _get_registrations(events):
+        if not registration.active:
+            continue
+        if dispatcher is None or registration.synchronous:
+            _call(registration, events, kwargs)
+        else:
+            dispatcher.queue(registration, events, kwargs)
+
+def _merge_kwargs(kwargs_list):
+    """Merge keyword arguments from several notifications: list (or
+    tuple) values are concatenated and, otherwise, the last value wins.
+    """
+    merged = {}
+    for kwargs in kwargs_list:
+        for key, value in kwargs.items():
+            if isinstance(value, (list, tuple)):
+                if isinstance(merged.get(key), list):
+                    merged[key].extend(value)
+                else:
+                    merged[key] = list(value)
+            else:
+                merged[key] = value
+    return merged
+
+def _dispatch_batch(notifications):
+    """Call each callback interested in any of the (events, kwargs)
+    "notifications" once with the merged kwargs of those it's
+    interested in.
+    """
+    kwargs_for_events = {}
+    for events, kwargs in notifications:
+        kwargs_for_events.setdefault(events, []).append(kwargs)
+    all_events = 0
+    for events in kwargs_for_events:
+        all_events |= events
+    for registration in _get_registrations(all_events):
+        if registration.active:
+            matching_events = 0
+            matching = []
+            for events, kwargs_list in kwargs_for_events.items():
+                if events & registration.events:
+                    matching_events |= events
+                    matching.extend(kwargs_list)
+            _invoke(registration, matching_events, _merge_kwargs(matching))
+
+_BATCH_STATE = threading.local()
+
+class batched:
+    """Context manager within which notifications made by the current
+    thread are collected and then, on exit from the outermost such
+    context, dispatched with each interested callback being called
+    once with the merged keyword arguments of the notifications that
+    interest it.
+    """
+    def __enter__(self):
+        if getattr(_BATCH_STATE, "depth", 0) == 0:
+            _BATCH_STATE.depth = 0
+            _BATCH_STATE.notifications = []
+        _BATCH_STATE.depth += 1
+        return self
+
+    def __exit__(self, *args):
+        _BATCH_STATE.depth -= 1
+        if _BATCH_STATE.depth == 0:
+            notifications, _BATCH_STATE.notifications = _BATCH_STATE.notifications, []
+            if notifications:
+                _dispatch_batch(notifications)
+
+class Debouncer:
+    """Collect notifications (from any thread) and dispatch them as a
+    batch (see batched) "window" seconds after the first of them.  As
+    that would be done on a timer thread "dispatch" (e.g. GLib.idle_add)
+    may be supplied to have it done elsewhere: it will be passed a
+    callable with no arguments.
+    """
+    def __init__(self, window=0.1, dispatch=None):
+        self._window = window
+        self._dispatch = dispatch
+        self._notifications = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def notify_events(self, events, **kwargs):
+        with self._lock:
+            self._notifications.append((events, kwargs))
+            if self._timer is None:
+                self._timer = threading.Timer(self._window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Dispatch the collected notifications now."""
+        with self._lock:
+            notifications, self._notifications = self._notifications, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if notifications:
+            if self._dispatch is None:
+                _dispatch_batch(notifications)
+            else:
+                self._dispatch(lambda: _dispatch_batch(notifications))
 
 def notify_events(events, **kwargs):
     """Notify interested parties of events that have occured.
@@ -86,20 +501,10 @@ def notify_events(events, **kwargs):
     Keyword Argument:
     data -- extra data the notifier thinks may be of use to the callback.
     """
-    invalid_cbs = []
-    for registered_events, callback in _NOTIFICATION_CBS:
-        if registered_events & events:
-            try:
-                callback(**kwargs)
-            except Exception as edata:
-                # TODO: try to be more explicit in naming exception type to catch here
-                # this is done to catch the race between a caller has going away and deleting its notifications
-                if True: # NB: for debug assistance e.g . locating exceptions not due to caller going away
-                    print("WS NOTIFY:\t edata: {}\n\t\t callback: {}\n\t\t kwargs: {}".format(edata, callback, kwargs))
-                    raise edata
-                invalid_cbs.append((registered_events, callback))
-    for cb_token in invalid_cbs:
-        del_notification_cb(cb_token)
+    if getattr(_BATCH_STATE, "depth", 0):
+        _BATCH_STATE.notifications.append((events, kwargs))
+    else:
+        _dispatch(events, kwargs)
 
 
 class Listener:
@@ -114,17 +519,25 @@ class Listener:
         except TypeError:
             pass
 
-    def add_notification_cb(self, events, callback):
+    def add_notification_cb(self, events, callback, priority=0, synchronous=False, weak=None):
         """Register a callback for notification of the specified events.
         Record a token to facilitate deletion at a later time.
 
         Arguments:
         events   -- the set of events for which the callback should be called.
         callback -- the procedure to be called.
+        priority -- callbacks with higher priority are called first.
+        synchronous -- always call on the notifying thread.
+        weak     -- only hold a weak reference to a bound method's object.
+                    By default, this is done for bound methods (usually
+                    the listener's own) so that a listener that is never
+                    destroyed doesn't live for ever.
 
         Return a token that identifies the callback to facilitate deletion.
         """
-        self._listener_cbs.append(add_notification_cb(events, callback))
+        if weak is None:
+            weak = _is_bound_method(callback)
+        self._listener_cbs.append(add_notification_cb(events, callback, priority, synchronous, weak))
 
     def listener_destroy_cb(self, *args):
         """Remove all of my callbacks from the notification database"""
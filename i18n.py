@@ -17,10 +17,13 @@
 import os
 import sys
 
-def find_locale_dir():
+def _get_source_locale_dir():
+    return os.path.join(sys.path[0], "i10n")
+
+def _search_for_locale_dir():
     # find the locale directory
     # first look in the source directory (so that we can run uninstalled)
-    LOCALE_DIR = os.path.join(sys.path[0], "i10n")
+    LOCALE_DIR = _get_source_locale_dir()
     if not os.path.exists(LOCALE_DIR) or not os.path.isdir(LOCALE_DIR):
         # if we get here it means we're installed and we assume that the
         # locale files were installed under the same prefix as the
@@ -38,3 +41,66 @@ def find_locale_dir():
         if not (os.path.exists(LOCALE_DIR) and os.path.isdir(LOCALE_DIR)):
             LOCALE_DIR = os.path.join(sys.prefix, "share", "locale")
     return LOCALE_DIR
+
+def _get_cache_file_path(app_name):
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, app_name, "locale_dir")
+
+def _format_cache_entry(locale_dir):
+    # the answer depends on where we started looking (and on the prefix)
+    return "{0}\n{1}\n{2}\n".format(sys.path[0], sys.prefix, locale_dir)
+
+def _read_cache_file(cache_file_path):
+    try:
+        with open(cache_file_path) as f_obj:
+            return f_obj.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+def _read_cached_locale_dir(cache_file_path):
+    contents = _read_cache_file(cache_file_path)
+    if contents is None:
+        return None
+    lines = contents.splitlines()
+    if len(lines) != 3 or contents != _format_cache_entry(lines[2]) or not os.path.isdir(lines[2]):
+        return None
+    return lines[2]
+
+def _write_cached_locale_dir(cache_file_path, locale_dir):
+    contents = _format_cache_entry(locale_dir)
+    if _read_cache_file(cache_file_path) == contents:
+        return
+    try:
+        os.makedirs(os.path.dirname(cache_file_path), exist_ok=True)
+        temp_file_path = "{0}.{1}".format(cache_file_path, os.getpid())
+        with open(temp_file_path, "w") as f_obj:
+            f_obj.write(contents)
+        os.replace(temp_file_path, cache_file_path)
+    except OSError:
+        pass
+
+def find_locale_dir(app_name=None):
+    """Return the locale directory.  If "app_name" is given, the
+    directory named by the environment variable <APP_NAME>_LOCALE_DIR
+    is used if it's set and, otherwise, the result of the search is
+    cached (in $XDG_CACHE_HOME/<app_name>/locale_dir) for use by
+    subsequent runs if it exists.  The source directory is always checked first so
+    that running uninstalled isn't affected by the cache.
+    """
+    if not app_name:
+        return _search_for_locale_dir()
+    locale_dir = os.environ.get("{0}_LOCALE_DIR".format(app_name.upper().replace("-", "_")))
+    if locale_dir:
+        return locale_dir
+    locale_dir = _get_source_locale_dir()
+    if os.path.isdir(locale_dir):
+        return locale_dir
+    cache_file_path = _get_cache_file_path(app_name)
+    locale_dir = _read_cached_locale_dir(cache_file_path)
+    if locale_dir is None:
+        locale_dir = _search_for_locale_dir()
+        # NB: the last resort answer needn't exist and, if it doesn't,
+        # caching it could hide locale files installed later
+        if os.path.isdir(locale_dir):
+            _write_cached_locale_dir(cache_file_path, locale_dir)
+    return locale_dir
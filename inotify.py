@@ -0,0 +1,219 @@
+### Copyright (C) 2026 The pysm_bab contributors
+###
+### This program is free software; you can redistribute it and/or modify
+### it under the terms of the GNU General Public License as published by
+### the Free Software Foundation; version 2 of the License only.
+###
+### This program is distributed in the hope that it will be useful,
+### but WITHOUT ANY WARRANTY; without even the implied warranty of
+### MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+### GNU General Public License for more details.
+###
+### You should have received a copy of the GNU General Public License
+### along with this program; if not, write to the Free Software
+### Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Watch directories (using Linux's inotify) and notify enotify
+listeners of changes to their contents made by other processes.
+"""
+
+import os
+import errno
+import select
+import struct
+import threading
+import time
+
+from . import enotify
+from . import os_utils
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# NB: IN_MODIFY is not watched as it's reported for every write() (e.g.
+# to a log file) and IN_CLOSE_WRITE covers completed writes
+_WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE | IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+# how kernel events map onto our file events
+_EVENT_MAP = (
+    (IN_CREATE | IN_MOVED_TO, os_utils.E_FILE_ADDED),
+    (IN_DELETE | IN_MOVED_FROM | IN_DELETE_SELF | IN_MOVE_SELF, os_utils.E_FILE_DELETED),
+    (IN_CLOSE_WRITE | IN_ATTRIB, os_utils.E_FILE_CHANGES),
+)
+
+_EVENT_HDR = struct.Struct("iIII")
+_READ_SIZE = 65536
+
+_LIBC = None
+
+def _get_libc():
+    global _LIBC
+    if _LIBC is None:
+        import ctypes
+        import ctypes.util
+        _LIBC = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        _LIBC.inotify_init1.argtypes = [ctypes.c_int]
+        _LIBC.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _LIBC.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return _LIBC
+
+def is_available():
+    try:
+        return hasattr(_get_libc(), "inotify_init1")
+    except OSError:
+        return False
+
+def _check(retval):
+    if retval < 0:
+        import ctypes
+        eno = ctypes.get_errno()
+        raise OSError(eno, os.strerror(eno))
+    return retval
+
+class FileWatcher:
+    """Watch the given directories (and, if "recursive", the directories
+    within them) on a background thread.  Events arriving within "debounce"
+    seconds of the first one are coalesced into a single call to
+    enotify.notify_events() whose "fsi_paths" keyword argument lists the
+    affected paths.  As notification would otherwise be done on the
+    watcher's thread "dispatch" (e.g. GLib.idle_add) may be supplied to
+    have it run elsewhere: it will be passed a callable with no arguments.
+    If the system's limit on the number of watches is reached, directories
+    go unwatched and "watches_exhausted" is set.
+    """
+    def __init__(self, dir_paths, recursive=True, debounce=0.25, dispatch=None):
+        self._dir_paths = [os.path.abspath(dir_path) for dir_path in dir_paths]
+        self._recursive = recursive
+        self._debounce = debounce
+        self._dispatch = dispatch
+        self._fd = None
+        self._paths_for_wd = {}
+        self._thread = None
+        self._wake_fds = None
+        self.watches_exhausted = False
+
+    def start(self):
+        """Start watching and return False if some directories couldn't
+        be watched as the system's limit on watches was reached.
+        """
+        libc = _get_libc()
+        self._fd = _check(libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC))
+        all_watched = True
+        for dir_path in self._dir_paths:
+            all_watched = self.add_watch(dir_path) and all_watched
+        self._wake_fds = os.pipe()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return all_watched
+
+    def stop(self):
+        if self._thread is None:
+            return
+        os.write(self._wake_fds[1], b"x")
+        self._thread.join()
+        self._thread = None
+        for fd in self._wake_fds + (self._fd,):
+            os.close(fd)
+        self._fd = self._wake_fds = None
+        self._paths_for_wd = {}
+
+    def add_watch(self, dir_path):
+        """Watch dir_path (and, if recursive, its sub-directories) and
+        return False if the system's limit on watches was reached.
+        """
+        libc = _get_libc()
+        stack = [dir_path]
+        while stack:
+            a_dir_path = stack.pop()
+            try:
+                wd = _check(libc.inotify_add_watch(self._fd, os.fsencode(a_dir_path), _WATCH_MASK))
+            except OSError as edata:
+                if edata.errno == errno.ENOSPC:
+                    # we've run out of watches so there's no point going on
+                    self.watches_exhausted = True
+                    return False
+                continue
+            self._paths_for_wd[wd] = a_dir_path
+            if self._recursive:
+                try:
+                    with os.scandir(a_dir_path) as dir_entries:
+                        stack.extend(dir_entry.path for dir_entry in dir_entries if dir_entry.is_dir(follow_symlinks=False))
+                except OSError:
+                    pass
+        return True
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, name_len = _EVENT_HDR.unpack_from(data, offset)
+            offset += _EVENT_HDR.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            yield wd, mask, os.fsdecode(name)
+
+    def _notify(self, events, fsi_paths):
+        notify = lambda: enotify.notify_events(events, fsi_paths=fsi_paths)
+        if self._dispatch is not None:
+            self._dispatch(notify)
+            return
+        try:
+            notify()
+        except Exception:
+            # enotify has already reported it (via its exception handler)
+            # and one broken listener mustn't stop us watching
+            pass
+
+    def _run(self):
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        poller.register(self._wake_fds[0], select.POLLIN)
+        events = 0
+        fsi_paths = {}
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0) * 1000
+            ready = [fd for fd, _mask in poller.poll(timeout)]
+            if self._wake_fds[0] in ready:
+                break
+            if self._fd in ready:
+                for wd, mask, name in self._read_events():
+                    if mask & IN_Q_OVERFLOW:
+                        # we've lost track so say that everything's changed
+                        events |= os_utils.E_FILE_CHANGES
+                        fsi_paths.update((dir_path, None) for dir_path in self._dir_paths)
+                        continue
+                    dir_path = self._paths_for_wd.get(wd)
+                    if mask & IN_IGNORED:
+                        self._paths_for_wd.pop(wd, None)
+                    if dir_path is None:
+                        continue
+                    fsi_path = os.path.join(dir_path, name) if name else dir_path
+                    if self._recursive and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                        self.add_watch(fsi_path)
+                    for kernel_events, file_events in _EVENT_MAP:
+                        if mask & kernel_events:
+                            events |= file_events
+                            fsi_paths[fsi_path] = None
+                if events and deadline is None:
+                    deadline = time.monotonic() + self._debounce
+            if deadline is not None and time.monotonic() >= deadline:
+                self._notify(events, list(fsi_paths))
+                events = 0
+                fsi_paths = {}
+                deadline = None
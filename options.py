@@ -18,8 +18,16 @@
 # TODO: add mechanism for setting both global and local options
 import os
 import collections
+import time
+import tempfile
+import threading
 import configparser
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 from . import CmdResult
 
 try:
@@ -27,52 +35,138 @@ try:
 except ImportError:
     from ... import CONFIG_DIR_PATH, PGND_CONFIG_DIR_PATH
 
+# resolved option values keyed by (section, oname, pgnd_only)
+_VALUE_CACHE = {}
+
+# how often (in seconds) to check whether the options files have changed
+STAT_CHECK_INTERVAL = 1.0
+
+def _file_signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+class _OptionsFile:
+    """An options file that is parsed on first use and, thereafter,
+    reparsed whenever its (mtime, size, inode) signature changes.
+    """
+    def __init__(self, file_path, error_template):
+        self.file_path = file_path
+        self.error_template = error_template
+        self._parser = None
+        self._signature = None
+
+    @property
+    def parser(self):
+        if self._parser is None:
+            self.load()
+        return self._parser
+
+    def load(self, keep_on_error=False):
+        new_version = configparser.SafeConfigParser()
+        signature = _file_signature(self.file_path) if self.file_path else None
+        try:
+            new_version.read(self.file_path)
+        except configparser.ParsingError as edata:
+            if not keep_on_error or self._parser is None:
+                self._parser, self._signature = new_version, signature
+                _VALUE_CACHE.clear()
+            return CmdResult.error(stderr=self.error_template.format(str(edata)))
+        self._parser, self._signature = new_version, signature
+        _VALUE_CACHE.clear()
+        return CmdResult.ok()
+
+    def check_for_changes(self):
+        if self._parser is not None and self.file_path and _file_signature(self.file_path) != self._signature:
+            self.load(keep_on_error=True)
+
+    def commit(self, settings):
+        """Write the (section, oname, svalue) "settings" to the file.
+        While holding an advisory lock, the file is reread (so that
+        changes made by other processes since we read it aren't lost),
+        the settings are applied and the result is written to a
+        temporary file which then atomically replaces it.
+        """
+        lock_fd = os.open(self.file_path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            options = configparser.SafeConfigParser()
+            try:
+                options.read(self.file_path)
+            except configparser.ParsingError:
+                # it's broken so start again from what we know
+                options = self.parser
+            for section, oname, svalue in settings:
+                if not options.has_section(section):
+                    options.add_section(section)
+                options.set(section, oname, svalue)
+            _write_atomically(self.file_path, options)
+            self._parser, self._signature = options, _file_signature(self.file_path)
+            _VALUE_CACHE.clear()
+        finally:
+            os.close(lock_fd)
+
+def _write_atomically(file_path, options):
+    dir_path = os.path.dirname(file_path) or os.curdir
+    try:
+        mode = os.stat(file_path).st_mode & 0o7777
+    except OSError:
+        mode = 0o644
+    fd, temp_file_path = tempfile.mkstemp(dir=dir_path, prefix=".options-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f_obj:
+            options.write(f_obj)
+            f_obj.flush()
+            os.fsync(f_obj.fileno())
+        os.chmod(temp_file_path, mode)
+        os.replace(temp_file_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_file_path)
+        except OSError:
+            pass
+        raise
+
 _GLOBAL_CFG_FILE_PATH = os.path.join(CONFIG_DIR_PATH, "options.cfg") if CONFIG_DIR_PATH else ""
-GLOBAL_OPTIONS = configparser.SafeConfigParser()
+_GLOBAL_OPTIONS_FILE = _OptionsFile(_GLOBAL_CFG_FILE_PATH, _("Error reading global options: {0}\n"))
 
 def load_global_options():
-    global GLOBAL_OPTIONS
-    GLOBAL_OPTIONS = configparser.SafeConfigParser()
-    try:
-        GLOBAL_OPTIONS.read(_GLOBAL_CFG_FILE_PATH)
-    except configparser.ParsingError as edata:
-        return CmdResult.error(stderr=_("Error reading global options: {0}\n").format(str(edata)))
-    return CmdResult.ok()
+    return _GLOBAL_OPTIONS_FILE.load()
 
 def reload_global_options():
-    global GLOBAL_OPTIONS
-    new_version = configparser.SafeConfigParser()
-    try:
-        new_version.read(_GLOBAL_CFG_FILE_PATH)
-    except configparser.ParsingError as edata:
-        return CmdResult.error(stderr=_("Error reading global options: {0}\n").format(str(edata)))
-    GLOBAL_OPTIONS = new_version
-    return CmdResult.ok()
+    return _GLOBAL_OPTIONS_FILE.load(keep_on_error=True)
 
 _PGND_CFG_FILE_PATH = os.path.join(PGND_CONFIG_DIR_PATH, "options.cfg") if PGND_CONFIG_DIR_PATH else ""
-PGND_OPTIONS = configparser.SafeConfigParser()
+_PGND_OPTIONS_FILE = _OptionsFile(_PGND_CFG_FILE_PATH, _("Error reading playground options: {0}\n"))
 
 def load_pgnd_options():
-    global PGND_OPTIONS
-    PGND_OPTIONS = configparser.SafeConfigParser()
-    try:
-        PGND_OPTIONS.read(_PGND_CFG_FILE_PATH)
-    except configparser.ParsingError as edata:
-        return CmdResult.error(stderr=_("Error reading playground options: {0}\n").format(str(edata)))
-    return CmdResult.ok()
+    return _PGND_OPTIONS_FILE.load()
 
 def reload_pgnd_options():
-    global PGND_OPTIONS
-    new_version = configparser.SafeConfigParser()
-    try:
-        new_version.read(_PGND_CFG_FILE_PATH)
-    except configparser.ParsingError as edata:
-        return CmdResult.error(stderr=_("Error reading playground options: {0}\n").format(str(edata)))
-    PGND_OPTIONS = new_version
-    return CmdResult.ok()
+    return _PGND_OPTIONS_FILE.load(keep_on_error=True)
+
+_next_check = 0.0
+
+def _check_for_changes():
+    global _next_check
+    now = time.monotonic()
+    if now >= _next_check:
+        _next_check = now + STAT_CHECK_INTERVAL
+        _GLOBAL_OPTIONS_FILE.check_for_changes()
+        _PGND_OPTIONS_FILE.check_for_changes()
 
-load_global_options()
-load_pgnd_options()
+def __getattr__(name):
+    # the options files are only read when they're first needed
+    if name == "GLOBAL_OPTIONS":
+        _check_for_changes()
+        return _GLOBAL_OPTIONS_FILE.parser
+    if name == "PGND_OPTIONS":
+        _check_for_changes()
+        return _PGND_OPTIONS_FILE.parser
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
 
 class OptionError(Exception): pass
 class DuplicateDefn(OptionError): pass
@@ -100,20 +194,44 @@ def str_to_bool(string):
         return None
 
 def get(section, oname, pgnd_only=False):
+    _check_for_changes()
+    try:
+        return _VALUE_CACHE[(section, oname, pgnd_only)]
+    except KeyError:
+        pass
+    value = _get(section, oname, pgnd_only)
+    _VALUE_CACHE[(section, oname, pgnd_only)] = value
+    return value
+
+def _get(section, oname, pgnd_only):
     # This should cause an exception if section:oname is not known
     # which is what we want
     str_to_val = DEFINITIONS[section][oname].str_to_val
     value = None
-    if PGND_OPTIONS.has_option(section, oname):
-        value = str_to_val(PGND_OPTIONS.get(section, oname))
-    elif not pgnd_only and GLOBAL_OPTIONS.has_option(section, oname):
-        value = str_to_val(GLOBAL_OPTIONS.get(section, oname))
+    pgnd_options = _PGND_OPTIONS_FILE.parser
+    if pgnd_options.has_option(section, oname):
+        value = str_to_val(pgnd_options.get(section, oname))
+    elif not pgnd_only:
+        global_options = _GLOBAL_OPTIONS_FILE.parser
+        if global_options.has_option(section, oname):
+            value = str_to_val(global_options.get(section, oname))
     return value if value is not None else DEFINITIONS[section][oname].default
 
-def _set_option(options, cfg_file_path, section, oname, value):
+def get_many(section, onames=None, pgnd_only=False):
+    """Return a dictionary of the values of the named options (or, by
+    default, all options defined) in "section".
+    """
+    if onames is None:
+        onames = DEFINITIONS[section]
+    _check_for_changes()
+    return {oname: get(section, oname, pgnd_only) for oname in onames}
+
+def _set_option(options_file, section, oname, value):
     # if the application doesn't set this value then it doesn't want global options
-    if not cfg_file_path:
+    if not options_file.file_path:
         raise OptionsNotConfigured()
+    _check_for_changes()
+    options = options_file.parser
     # Make sure the option has been defined
     assert section in DEFINITIONS and oname in DEFINITIONS[section]
     # NB: just because it's defined doesn't meant that GLOBAL_OPTIONS knows about it
@@ -126,15 +244,46 @@ def _set_option(options, cfg_file_path, section, oname, value):
         svalue = "true" if value else "false"
     else:
         svalue = str(value)
-    options.set(section, oname, svalue)
-    with open(cfg_file_path, "w") as f_obj:
-        options.write(f_obj)
+    if getattr(_TRANSACTION_STATE, "depth", 0):
+        # so that it can be read before the transaction is committed
+        options.set(section, oname, svalue)
+        _VALUE_CACHE.clear()
+        _TRANSACTION_STATE.settings.setdefault(options_file, []).append((section, oname, svalue))
+    else:
+        options_file.commit([(section, oname, svalue)])
+
+_TRANSACTION_STATE = threading.local()
+
+class transaction:
+    """Context manager within which options set (by the current thread)
+    are buffered and then, on exit from the outermost such context,
+    written with a single (locked and atomic) update of each options
+    file concerned.  If an exception occurs, nothing is written and the
+    options files are reread to discard the buffered settings.
+    """
+    def __enter__(self):
+        if getattr(_TRANSACTION_STATE, "depth", 0) == 0:
+            _TRANSACTION_STATE.depth = 0
+            _TRANSACTION_STATE.settings = {}
+        _TRANSACTION_STATE.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _TRANSACTION_STATE.depth -= 1
+        if _TRANSACTION_STATE.depth:
+            return
+        settings, _TRANSACTION_STATE.settings = _TRANSACTION_STATE.settings, {}
+        for options_file, file_settings in settings.items():
+            if exc_type is None:
+                options_file.commit(file_settings)
+            else:
+                options_file.load(keep_on_error=True)
 
 def set_global(section, oname, value):
-    return _set_option(GLOBAL_OPTIONS, _GLOBAL_CFG_FILE_PATH, section, oname, value)
+    return _set_option(_GLOBAL_OPTIONS_FILE, section, oname, value)
 
 def set_pgnd(section, oname, value):
-    return _set_option(PGND_OPTIONS, _PGND_CFG_FILE_PATH, section, oname, value)
+    return _set_option(_PGND_OPTIONS_FILE, section, oname, value)
 
 define("user", "name", Defn(str, None, _("User's display name e.g. Fred Bloggs")))
 define("user", "email", Defn(str, None, _("User's email address e.g. fred@bloggs.com")))
@@ -16,8 +16,11 @@
 import os
 import shutil
 import errno
+import stat
+import threading
+import time
 
-from . import CmdResult, Suggestion
+from . import CmdResult, ResultAccumulator, Suggestion
 
 from . import enotify
 
@@ -30,6 +33,9 @@ class Relation:
     MOVED_FROM = "<-"
     MOVED_TO = "->"
 
+# the most error message text kept in the result of a bulk operation
+MAX_ERROR_TEXT = 65536
+
 class _DummyLog:
     def start_cmd(self, *args, **kwargs): pass
     def end_cmd(self, *args, **kwargs): pass
@@ -41,6 +47,230 @@ def set_console_log(console_log):
     global _CONSOLE_LOG
     _CONSOLE_LOG = console_log if console_log else _DummyLog()
 
+_WORKER_POOL = None
+_WORKER_POOL_LOCK = threading.Lock()
+
+def _get_worker_pool():
+    """Return the (lazily created) thread pool used for bulk file operations"""
+    global _WORKER_POOL
+    with _WORKER_POOL_LOCK:
+        if _WORKER_POOL is None:
+            import concurrent.futures
+            _WORKER_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+        return _WORKER_POOL
+
+_FICLONE = 0x40049409 # from <linux/fs.h>
+_COPY_CHUNK_SIZE = 1 << 30
+
+def _copy_file_data(fsrc, fdst):
+    """Copy the contents of fsrc to fdst using the cheapest method that
+    works: a reflink clone, copy_file_range(), sendfile() or read/write.
+    Each method carries on from where a failed predecessor left off.
+    """
+    try:
+        import fcntl
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        return
+    except (ImportError, OSError):
+        pass
+    for copy_range in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+        if copy_range is None:
+            continue
+        try:
+            if copy_range is os.sendfile:
+                while os.sendfile(fdst.fileno(), fsrc.fileno(), None, _COPY_CHUNK_SIZE):
+                    pass
+            else:
+                while copy_range(fsrc.fileno(), fdst.fileno(), _COPY_CHUNK_SIZE):
+                    pass
+            return
+        except OSError as edata:
+            if edata.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF):
+                raise
+    shutil.copyfileobj(fsrc, fdst)
+
+_SPECIAL_FILE_KINDS = (
+    (stat.S_ISFIFO, "named pipe"),
+    (stat.S_ISSOCK, "socket"),
+    (stat.S_ISCHR, "character device"),
+    (stat.S_ISBLK, "block device"),
+)
+
+def _check_not_special_file(file_path):
+    # NB: opening a named pipe would block (forever) so, like copyfile(),
+    # we refuse to copy them (and the other kinds of special file)
+    try:
+        mode = os.stat(file_path).st_mode
+    except OSError:
+        return
+    for is_kind, kind in _SPECIAL_FILE_KINDS:
+        if is_kind(mode):
+            raise shutil.SpecialFileError("`{0}` is a {1}".format(file_path, kind))
+
+def _copy_file(src_path, dst_path):
+    """Equivalent of shutil.copy2() returning the number of bytes copied"""
+    _check_not_special_file(src_path)
+    _check_not_special_file(dst_path)
+    with open(src_path, "rb") as fsrc, open(dst_path, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        _copy_file_data(fsrc, fdst)
+    shutil.copystat(src_path, dst_path)
+    return size
+
+class _CopyJob:
+    def __init__(self, src_path, dst_path):
+        self.src_path = src_path
+        self.dst_path = dst_path
+        self.oserror = None
+        self.errors = []
+
+    def check(self):
+        """Raise the exception that shutil.copy2()/copytree() would have."""
+        if self.oserror is not None:
+            raise self.oserror
+        if self.errors:
+            raise shutil.Error(self.errors)
+
+class _CopyEngine:
+    """Copy files and directory trees (with the same semantics as
+    shutil.copy2() and shutil.copytree()) with the file copies done
+    by a pool of worker threads.  While waiting for completion progress
+    is reported on the console log.
+    """
+    PROGRESS_INTERVAL = 1.0
+    BATCH_SIZE = 32
+
+    def __init__(self):
+        self._pool = _get_worker_pool()
+        self._futures = []
+        self._dirs = []
+        self._lock = threading.Lock()
+        self._nbytes = 0
+
+    def _copy_files(self, batch):
+        nbytes = 0
+        for src_path, dst_path, on_error in batch:
+            try:
+                nbytes += _copy_file(src_path, dst_path)
+            except OSError as edata:
+                on_error(edata)
+        with self._lock:
+            self._nbytes += nbytes
+
+    def _submit_files(self, batch):
+        # batch the files to amortize the cost of handing them to the pool
+        for index in range(0, len(batch), self.BATCH_SIZE):
+            self._futures.append(self._pool.submit(self._copy_files, batch[index:index + self.BATCH_SIZE]))
+
+    def _copy_tree(self, src_path, dst_path, errors):
+        os.makedirs(dst_path)
+        self._dirs.append((src_path, dst_path, errors))
+        with os.scandir(src_path) as dir_entries:
+            dir_entries = list(dir_entries)
+        batch = []
+        for dir_entry in dir_entries:
+            dst_name = os.path.join(dst_path, dir_entry.name)
+            try:
+                # NB: like copytree(symlinks=False) we follow symbolic links
+                if dir_entry.is_dir():
+                    self._copy_tree(dir_entry.path, dst_name, errors)
+                else:
+                    on_error = lambda edata, src_name=dir_entry.path, dst_name=dst_name: errors.append((src_name, dst_name, str(edata)))
+                    batch.append((dir_entry.path, dst_name, on_error))
+            except OSError as edata:
+                errors.append((dir_entry.path, dst_name, str(edata)))
+        self._submit_files(batch)
+
+    def copy(self, src_path, dst_path, src_is_dir=None):
+        """Start copying src_path to dst_path and return a _CopyJob whose
+        check() method should be called after wait() has completed.
+        If the caller has already established whether src_path is (or
+        links to) a directory it can say so with "src_is_dir".
+        """
+        job = _CopyJob(src_path, dst_path)
+        if src_is_dir is None:
+            src_is_dir = os.path.isdir(src_path)
+        try:
+            if src_is_dir:
+                self._copy_tree(src_path, dst_path, job.errors)
+            else:
+                self._submit_files([(src_path, dst_path, lambda edata: setattr(job, "oserror", edata))])
+        except OSError as edata:
+            job.oserror = edata
+        return job
+
+    def wait(self):
+        import concurrent.futures
+        start = last_report = time.monotonic()
+        pending = self._futures
+        while pending:
+            _done, pending = concurrent.futures.wait(pending, timeout=self.PROGRESS_INTERVAL)
+            now = time.monotonic()
+            if now - last_report >= self.PROGRESS_INTERVAL:
+                last_report = now
+                mbytes = self._nbytes / 1e6
+                _CONSOLE_LOG.append_stdout(_("Copied {0:.1f} MB ({1:.1f} MB/s)\n").format(mbytes, mbytes / (now - start)))
+        self._futures = []
+        # directory metadata has to be copied after their contents
+        for src_path, dst_path, errors in reversed(self._dirs):
+            try:
+                shutil.copystat(src_path, dst_path)
+            except OSError as edata:
+                if getattr(edata, "winerror", None) is None:
+                    errors.append((src_path, dst_path, str(edata)))
+        self._dirs = []
+
+# Kinds of existing file system items as far as overwriting them is
+# concerned (None means that it doesn't exist according to os.path.exists())
+_FSI_DIR, _FSI_NON_DIR = "dir", "non_dir"
+
+def _fsi_kind(fsi_path, dir_entry=None):
+    """Classify fsi_path with a single lstat() (or none if its DirEntry
+    is supplied) plus a stat() if it's a symbolic link.
+    """
+    if dir_entry is None:
+        try:
+            mode = os.lstat(fsi_path).st_mode
+        except (OSError, ValueError):
+            return None
+        is_link, is_dir = stat.S_ISLNK(mode), stat.S_ISDIR(mode)
+    else:
+        is_link, is_dir = dir_entry.is_symlink(), dir_entry.is_dir(follow_symlinks=False)
+    if is_link:
+        return _FSI_NON_DIR if os.path.exists(fsi_path) else None
+    return _FSI_DIR if is_dir else _FSI_NON_DIR
+
+def _scan_dir(dir_path):
+    """Return a dictionary mapping names to DirEntrys for dir_path
+    (or None if it can't be read).
+    """
+    try:
+        with os.scandir(dir_path) as dir_entries:
+            return {dir_entry.name: dir_entry for dir_entry in dir_entries}
+    except OSError:
+        return None
+
+def _scanned_fsi_kind(fsi_path, dir_entries):
+    """Classify fsi_path using its DirEntry in dir_entries (as returned
+    by _scan_dir() for its directory) if it's there.
+    """
+    dir_entry = None if dir_entries is None else dir_entries.get(os.path.basename(fsi_path))
+    # NB: a missing name is checked with lstat() as, on case insensitive
+    # or normalising file systems, the item may exist under another name
+    return _fsi_kind(fsi_path, dir_entry)
+
+def _get_fsi_kinds(fsi_paths):
+    """Return a list of the kinds of the file system items in fsi_paths
+    reading each directory that contains them only once.
+    """
+    fsi_paths = list(fsi_paths)
+    dir_paths = {}
+    for fsi_path in fsi_paths:
+        dir_paths.setdefault(os.path.dirname(fsi_path), None)
+    for dir_path in dir_paths:
+        dir_paths[dir_path] = _scan_dir(dir_path or os.curdir)
+    return [_scanned_fsi_kind(fsi_path, dir_paths[os.path.dirname(fsi_path)]) for fsi_path in fsi_paths]
+
 def get_destn_file_paths(file_paths, destn):
     if len(file_paths) == 1 and not os.path.isdir(destn):
         return [destn]
@@ -49,7 +279,8 @@ def get_destn_file_paths(file_paths, destn):
 
 def check_for_overwrites(destn_file_paths):
     from . import utils
-    overwritten = [file_path for file_path in destn_file_paths if os.path.exists(file_path)]
+    destn_file_paths = list(destn_file_paths)
+    overwritten = [file_path for file_path, kind in zip(destn_file_paths, _get_fsi_kinds(destn_file_paths)) if kind is not None]
     if overwritten:
         stderr = _("File(s):\n")
         for file_path in overwritten:
@@ -87,75 +318,173 @@ def os_create_file(file_path):
     _CONSOLE_LOG.end_cmd(result)
     return result
 
-def os_delete_fs_items(fsi_paths, events=E_FILE_DELETED, force=False):
+class _DeletionProgress:
+    """Keep count of deleted file system items and pass it to the
+    client's "progress" callback at most every PROGRESS_INTERVAL seconds.
+    """
+    PROGRESS_INTERVAL = 0.5
+
+    def __init__(self, progress=None):
+        self.count = 0
+        self._progress = progress
+        self._last_report = time.monotonic()
+
+    def add(self, count, final=False):
+        self.count += count
+        if self._progress is not None:
+            now = time.monotonic()
+            if final or now - self._last_report >= self.PROGRESS_INTERVAL:
+                self._last_report = now
+                self._progress(self.count)
+
+def _check_cancel(cancel, fsi_path):
+    if cancel is not None and cancel.is_set():
+        raise OSError(errno.ECANCELED, os.strerror(errno.ECANCELED), fsi_path)
+
+def _unlink_files(file_paths, cancel, abandon):
+    count = 0
+    for file_path in file_paths:
+        if abandon.is_set() or (cancel is not None and cancel.is_set()):
+            break
+        try:
+            os.unlink(file_path)
+        except OSError as edata:
+            return count, edata
+        count += 1
+    return count, None
+
+_DELETE_BATCH_SIZE = 64
+
+def _delete_tree(dir_path, progress, cancel=None):
+    """Equivalent of shutil.rmtree() that unlinks files using the worker
+    pool and then removes the directories bottom up.  Raise the first
+    OSError encountered (or one with errno.ECANCELED if "cancel" is set).
+    """
+    import concurrent.futures
+    pool = _get_worker_pool()
+    dir_paths = []
+    futures = []
+    # set if the walk fails so that outstanding unlinks stop promptly
+    abandon = threading.Event()
+    stack = [dir_path]
+    try:
+        while stack:
+            _check_cancel(cancel, dir_path)
+            a_dir_path = stack.pop()
+            dir_paths.append(a_dir_path)
+            file_paths = []
+            with os.scandir(a_dir_path) as dir_entries:
+                for dir_entry in dir_entries:
+                    if dir_entry.is_dir(follow_symlinks=False):
+                        stack.append(dir_entry.path)
+                    else:
+                        file_paths.append(dir_entry.path)
+            for index in range(0, len(file_paths), _DELETE_BATCH_SIZE):
+                futures.append(pool.submit(_unlink_files, file_paths[index:index + _DELETE_BATCH_SIZE], cancel, abandon))
+    except BaseException:
+        # don't leave workers deleting things after we've returned
+        abandon.set()
+        concurrent.futures.wait(futures)
+        for future in futures:
+            progress.add(future.result()[0])
+        raise
+    first_error = None
+    while futures:
+        done, futures = concurrent.futures.wait(futures, timeout=_DeletionProgress.PROGRESS_INTERVAL)
+        for future in done:
+            count, edata = future.result()
+            if edata is not None and first_error is None:
+                first_error = edata
+            progress.add(count)
+    if first_error is not None:
+        raise first_error
+    # parents precede their children in dir_paths
+    for a_dir_path in reversed(dir_paths):
+        _check_cancel(cancel, dir_path)
+        os.rmdir(a_dir_path)
+        progress.add(1)
+
+def os_delete_fs_items(fsi_paths, events=E_FILE_DELETED, force=False, progress=None, cancel=None):
+    """Delete the nominated file system items.  If supplied, "progress"
+    is called periodically with the number of items deleted so far and
+    setting the threading.Event "cancel" stops the deletion.
+    """
     from . import utils
     _CONSOLE_LOG.start_cmd(_("delete {0}").format(utils.quoted_join(fsi_paths)))
-    serr = ""
-    errorcode = CmdResult.ERROR
+    results = ResultAccumulator(MAX_ERROR_TEXT)
+    deletions = _DeletionProgress(progress)
     for fsi_path in fsi_paths:
         try:
+            _check_cancel(cancel, fsi_path)
             if os.path.isdir(fsi_path) and not os.path.islink(fsi_path):
                 if force:
-                    shutil.rmtree(fsi_path)
+                    _delete_tree(fsi_path, deletions, cancel)
                 else:
                     os.removedirs(fsi_path)
+                    deletions.add(1)
             else:
                 os.remove(fsi_path)
+                deletions.add(1)
             _CONSOLE_LOG.append_stdout(_("Deleted: {0}\n").format(fsi_path))
         except OSError as edata:
-            if edata.errno == errno.ENOTEMPTY:
-                errorcode = CmdResult.ERROR | Suggestion.FORCE
             errmsg = _("Error: {}: \"{}\"\n").format(edata.strerror, fsi_path)
-            serr += errmsg
+            result = CmdResult.error(stderr=errmsg)
+            results.add(result | Suggestion.FORCE if edata.errno == errno.ENOTEMPTY else result, fsi_path)
             _CONSOLE_LOG.append_stderr(errmsg)
+            if edata.errno == errno.ECANCELED:
+                break
+    deletions.add(0, final=True)
     _CONSOLE_LOG.end_cmd()
     enotify.notify_events(events)
-    return CmdResult(errorcode, "", serr)  if serr else CmdResult.ok()
+    return results.result()
+
+def _shutil_error_msg(src_path, opsym, tgt_path, edata):
+    lines = [_("Error: \"{0}\" {1} \"{2}\" failed.\n").format(src_path, opsym, tgt_path)]
+    for a_src_path, a_tgt_path, reason in edata.args[0]:
+        lines.append(_("Error: \"{0}\" {1} \"{2}\": {3}.\n").format(a_src_path, opsym, a_tgt_path, reason))
+    return "".join(lines)
 
 def os_move_or_copy_fs_item(fsi_path, destn, opsym, overwrite=False, force=False, verbose=False):
     assert opsym in (Relation.MOVED_TO, Relation.COPIED_TO), _("Invalid operation requested")
     new_path = os.path.join(destn, os.path.basename(fsi_path)) if destn.endswith(os.sep) else destn
     omsg = "{0} {1} {2}.".format(fsi_path, opsym, new_path) if verbose else ""
     _CONSOLE_LOG.start_cmd("{0} {1} {2}\n".format(fsi_path, opsym, new_path))
-    if os.path.exists(new_path):
+    new_path_kind = _fsi_kind(new_path)
+    if new_path_kind is not None:
         if not overwrite:
-            emsg = _("{0} \"{1}\" already exists.").format(_("Directory") if os.path.isdir(new_path) else _("File"), new_path)
+            is_dir = new_path_kind == _FSI_DIR or os.path.isdir(new_path)
+            emsg = _("{0} \"{1}\" already exists.").format(_("Directory") if is_dir else _("File"), new_path)
             result = CmdResult.error(omsg, emsg) | Suggestion.OVERWRITE_OR_RENAME
             _CONSOLE_LOG.end_cmd(result)
             return result
         try:
-            if os.path.isdir(new_path) and not os.path.islink(new_path):
+            if new_path_kind == _FSI_DIR:
                 if force:
                     shutil.rmtree(new_path)
                 else:
                     os.removedirs(new_path)
             else:
                 os.remove(new_path)
+        except shutil.Error as edata:
+            return CmdResult.error(omsg, _shutil_error_msg(fsi_path, opsym, new_path, edata))
         except OSError as edata:
             errorcode = CmdResult.ERROR | Suggestion.FORCE if edata.errno == errno.ENOTEMPTY else CmdResult.ERROR
             errmsg = _("Error: {}: \"{}\" {} \"{}\"\n").format(edata.strerror, fsi_path, opsym, new_path)
             _CONSOLE_LOG.append_stderr(errmsg)
             return CmdResult(errorcode, "", errmsg)
-        except shutil.Error as edata:
-            serr = _("Error: \"{0}\" {1} \"{2}\" failed.\n").format(fsi_path, opsym, new_path)
-            for src_path, dest_path, reason in edata.args:
-                serr += _("Error: \"{0}\" {1} \"{2}\": {3}.\n").format(src_path, opsym, dest_path, reason)
-            return CmdResult.error(omsg, serr)
     try:
         if opsym is Relation.MOVED_TO:
             os.rename(fsi_path, new_path)
-        elif os.path.isdir(fsi_path):
-            shutil.copytree(fsi_path, new_path)
         else:
-            shutil.copy2(fsi_path, new_path)
+            engine = _CopyEngine()
+            job = engine.copy(fsi_path, new_path)
+            engine.wait()
+            job.check()
         result = CmdResult.ok(omsg)
-    except OSError as edata:
-        result = CmdResult.error(omsg, _("Error: \"{0}\" {1} \"{2}\" failed. {3}.\n").format(fsi_path, opsym, new_path, edata.strerror))
     except shutil.Error as edata:
-        serr = _("Error: \"{0}\" {1} \"{2}\" failed.\n").format(fsi_path, opsym, new_path)
-        for src_path, dest_path, reason in edata.args:
-            serr += _("Error: \"{0}\" {1} \"{2}\": {3}.\n").format(src_path, opsym, dest_path, reason)
-        result = CmdResult.error(omsg, serr)
+        result = CmdResult.error(omsg, _shutil_error_msg(fsi_path, opsym, new_path, edata))
+    except OSError as edata:
+        result = CmdResult.error(omsg, _("Error: \"{0}\" {1} \"{2}\" failed. {3}.\n").format(fsi_path, opsym, new_path, edata.strerror or edata))
     _CONSOLE_LOG.end_cmd(result)
     enotify.notify_events(E_FILE_MOVED)
     return result
@@ -172,71 +501,83 @@ def os_move_or_copy_fs_items(fsi_paths, destn, opsym, overwrite=False, force=Fal
         else:
             return _("File \"{0}\" already exists.").format(overwrites[0])
     _CONSOLE_LOG.start_cmd("{0} {1} {2}\n".format(utils.quoted_join(fsi_paths), opsym, destn))
-    if not os.path.isdir(destn):
+    # Plan the operation reading the destination directory once rather
+    # than making several system calls for each target (only those not
+    # found in it need an lstat()) and (for copies) making a single
+    # stat() of each source
+    destn_entries = _scan_dir(destn)
+    if destn_entries is None and not os.path.isdir(destn):
         result = CmdResult.error(stderr=_("\"{0}\": Destination must be a directory for multifile move/copy.").format(destn))
         _CONSOLE_LOG.end_cmd(result)
         return result
-    opn_paths_list = [(fsi_path, os.path.join(destn, os.path.basename(fsi_path))) for fsi_path in fsi_paths]
-    omsg = "\n".join(["{0} {1} {2}.".format(src, opsym, destn) for (src, destn) in opn_paths_list]) if verbose else ""
+    opn_plan = []
+    for fsi_path in fsi_paths:
+        name = os.path.basename(fsi_path)
+        tgt = os.path.join(destn, name)
+        # NB: like copytree() we follow symbolic links to directories
+        src_is_dir = os.path.isdir(fsi_path) if opsym is Relation.COPIED_TO else None
+        tgt_kind = _scanned_fsi_kind(tgt, destn_entries)
+        opn_plan.append((fsi_path, src_is_dir, tgt, tgt_kind))
+    omsg = "\n".join(["{0} {1} {2}.".format(src, opsym, destn) for (src, _src_is_dir, destn, _kind) in opn_plan]) if verbose else ""
     if not overwrite:
-        overwrites = [destn for (src, destn) in opn_paths_list if os.path.exists(destn)]
+        overwrites = [destn for (src, _src_is_dir, destn, tgt_kind) in opn_plan if tgt_kind is not None]
         if len(overwrites) > 0:
             emsg = _overwrite_msg(overwrites)
             result = CmdResult.error(omsg, emsg) | Suggestion.OVERWRITE_OR_RENAME
             _CONSOLE_LOG.end_cmd(result)
             return result
-    failed_opns_str = ""
-    rescode = CmdResult.OK
-    for (src, tgt) in opn_paths_list:
+    results = ResultAccumulator(MAX_ERROR_TEXT)
+    engine = _CopyEngine()
+    copy_jobs = []
+    for (src, src_is_dir, tgt, tgt_kind) in opn_plan:
         if verbose:
             _CONSOLE_LOG.append_stdout("{0} {1} {2}.".format(src, opsym, tgt))
-        if os.path.exists(tgt):
+        if tgt_kind is not None:
             try:
-                if os.path.isdir(tgt) and not os.path.islink(tgt):
+                if tgt_kind == _FSI_DIR:
                     if force:
                         shutil.rmtree(tgt)
                     else:
                         os.removedirs(tgt)
                 else:
                     os.remove(tgt)
-            except OSError as edata:
-                rescode |= CmdResult.ERROR | Suggestion.FORCE if edata.errno == errno.ENOTEMPTY else CmdResult.ERROR
-                serr = _("Error: {}: \"{}\" {} \"{}\"\n").format(edata.strerror, src, opsym, tgt)
+            except shutil.Error as edata:
+                serr = _shutil_error_msg(src, opsym, tgt, edata)
                 _CONSOLE_LOG.append_stderr(serr)
-                failed_opns_str += serr
+                results.add(CmdResult.error(stderr=serr), src)
                 continue
-            except shutil.Error as edata:
-                rescode |= CmdResult.ERROR
-                serr = _("Error: \"{0}\" {1} \"{2}\" failed.\n").format(src, opsym, tgt)
-                for src_path, tgt_path, reason in edata.args:
-                    serr += _("Error: \"{0}\" {1} \"{2}\": {3}.\n").format(src_path, opsym, tgt_path, reason)
+            except OSError as edata:
+                serr = _("Error: {}: \"{}\" {} \"{}\"\n").format(edata.strerror, src, opsym, tgt)
                 _CONSOLE_LOG.append_stderr(serr)
-                failed_opns_str += serr
+                result = CmdResult.error(stderr=serr)
+                results.add(result | Suggestion.FORCE if edata.errno == errno.ENOTEMPTY else result, src)
                 continue
+        if opsym is Relation.COPIED_TO:
+            copy_jobs.append(engine.copy(src, tgt, src_is_dir))
+            continue
         try:
-            if opsym is Relation.MOVED_TO:
-                os.rename(src, tgt)
-            elif os.path.isdir(src):
-                shutil.copytree(src, tgt)
-            else:
-                shutil.copy2(src, tgt)
+            os.rename(src, tgt)
         except OSError as edata:
-            rescode |= CmdResult.ERROR
             serr = _("Error: \"{0}\" {1} \"{2}\" failed. {3}.\n").format(src, opsym, tgt, edata.strerror)
             _CONSOLE_LOG.append_stderr(serr)
-            failed_opns_str += serr
+            results.add(CmdResult.error(stderr=serr), src)
             continue
+    engine.wait()
+    for job in copy_jobs:
+        src, tgt = job.src_path, job.dst_path
+        try:
+            job.check()
         except shutil.Error as edata:
-            rescode |= CmdResult.ERROR
-            serr = _("Error: \"{0}\" {1} \"{2}\" failed.\n").format(src, opsym, tgt)
-            for src_path, tgt_path, reason in edata.args:
-                serr += _("Error: \"{0}\" {1} \"{2}\": {3}.\n").format(src_path, opsym, tgt_path, reason)
+            serr = _shutil_error_msg(src, opsym, tgt, edata)
             _CONSOLE_LOG.append_stderr(serr)
-            failed_opns_str += serr
-            continue
+            results.add(CmdResult.error(stderr=serr), src)
+        except OSError as edata:
+            serr = _("Error: \"{0}\" {1} \"{2}\" failed. {3}.\n").format(src, opsym, tgt, edata.strerror or edata)
+            _CONSOLE_LOG.append_stderr(serr)
+            results.add(CmdResult.error(stderr=serr), src)
     _CONSOLE_LOG.end_cmd()
     enotify.notify_events(E_FILE_MOVED)
-    return CmdResult(rescode, omsg, failed_opns_str)
+    return CmdResult(results.ecode, omsg, results.stderr)
 
 def os_copy_fs_item(fsi_path, destn, overwrite=False, force=False):
     return os_move_or_copy_fs_item(fsi_path, destn, opsym=Relation.COPIED_TO, overwrite=overwrite, force=force)
@@ -16,30 +16,548 @@
 """Run external commands and capture their output"""
 
 import os
+import sys
+import collections
 import signal
 import subprocess
 import shlex
 import select
+import selectors
+import threading
+import time
 
-from . import CmdResult, CmdFailure
+from . import CmdResult, CmdFailure, CmdStats
+from . import enotify
 
 # TODO: reimplement runext to usilise improved Python 3 subprocess module
 
 IS_POSIX = os.name == "posix"
 IS_MSFT = os.name == "nt" or os.name == "dos"
 
+_READ_SIZE = 65536
+
+def _take_records(buf, sep):
+    """Remove and return (as bytes) all complete records in "buf"."""
+    end = buf.rfind(sep) + 1
+    if not end:
+        return b""
+    data = bytes(buf[:end])
+    del buf[:end]
+    return data
+
+def _pump_output(sub, input_text=None, sep=b"\n", timeout=None):
+    """Generate (is_stderr, data) pairs from the output of "sub" as it
+    becomes available.  Each "data" chunk ends with "sep" (except for
+    a trailing fragment at EOF) so that it may be safely decoded unless
+    "sep" is None in which case the data is passed on as read.  The
+    selector blocks until there is something to do so that no CPU time
+    is wasted waiting and input_text is fed to the process as it is
+    able to accept it (avoiding deadlock when both sides are busy).
+    Raise subprocess.TimeoutExpired if the output hasn't been completed
+    within "timeout" seconds.
+    """
+    pending = {False: bytearray(), True: bytearray()}
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with selectors.DefaultSelector() as selector:
+        if input_text:
+            in_view = memoryview(input_text)
+            selector.register(sub.stdin, selectors.EVENT_WRITE)
+        else:
+            sub.stdin.close()
+        selector.register(sub.stdout, selectors.EVENT_READ, False)
+        selector.register(sub.stderr, selectors.EVENT_READ, True)
+        while selector.get_map():
+            ready = selector.select(None if deadline is None else max(deadline - time.monotonic(), 0))
+            if not ready and deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(sub.args, timeout)
+            for key, _mask in ready:
+                if key.fileobj is sub.stdin:
+                    try:
+                        in_view = in_view[os.write(key.fd, in_view[:select.PIPE_BUF]):]
+                    except BrokenPipeError:
+                        in_view = in_view[:0]
+                    if not in_view:
+                        selector.unregister(sub.stdin)
+                        sub.stdin.close()
+                    continue
+                buf = pending[key.data]
+                chunk = os.read(key.fd, _READ_SIZE)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    if buf:
+                        yield key.data, bytes(buf)
+                    continue
+                if sep is None:
+                    yield key.data, chunk
+                    continue
+                buf += chunk
+                data = _take_records(buf, sep)
+                if data:
+                    yield key.data, data
+
+class SpilledOutput:
+    """Command output that was too big to keep in memory and has been
+    written to an anonymous temporary file (which is mapped into memory).
+    Indexing and slicing give bytes, "view" (and, for Python >= 3.12, the
+    object itself) provides buffer protocol access without copying and
+    the lines can be iterated over.  The decoded text is only created
+    (and cached) if str() (or one of the str like methods) is called
+    and repr() only shows the start of the output.
+    """
+    def __init__(self, file_obj, decode=True):
+        import mmap
+        self._file = file_obj
+        self._mmap = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+        self._decode = decode
+        self._text = None
+
+    def __len__(self):
+        return len(self._mmap)
+
+    def __getitem__(self, index):
+        return self._mmap[index]
+
+    def __bytes__(self):
+        return self._mmap[:]
+
+    def __str__(self):
+        if self._text is None:
+            self._text = self._mmap[:].decode()
+        return self._text
+
+    def __repr__(self):
+        head = self._mmap[:64]
+        return "SpilledOutput({0} bytes: {1!r}{2})".format(len(self._mmap), head, "..." if len(self._mmap) > len(head) else "")
+
+    def _value(self):
+        return str(self) if self._decode else self._mmap[:]
+
+    def strip(self, chars=None):
+        return self._value().strip(chars)
+
+    def rstrip(self, chars=None):
+        return self._value().rstrip(chars)
+
+    def split(self, sep=None, maxsplit=-1):
+        return self._value().split(sep, maxsplit)
+
+    def __buffer__(self, flags):
+        return memoryview(self._mmap)
+
+    @property
+    def view(self):
+        return memoryview(self._mmap)
+
+    def __iter__(self):
+        return self.splitlines(keepends=True)
+
+    def splitlines(self, keepends=False):
+        """Generate the lines in the output (decoded if decoding was
+        requested when the command was run).
+        """
+        start = 0
+        size = len(self._mmap)
+        while start < size:
+            end = self._mmap.find(b"\n", start)
+            if end < 0:
+                line, start = self._mmap[start:], size
+            else:
+                line, start = self._mmap[start:end + 1 if keepends else end], end + 1
+            yield line.decode() if self._decode else line
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+class _OutputSink:
+    """Accumulate output in memory until it exceeds "spill_threshold"
+    bytes and in a temporary file thereafter.
+    """
+    def __init__(self, spill_threshold=None):
+        self._chunks = []
+        self._size = 0
+        self._spill_threshold = spill_threshold
+        self._file = None
+
+    def write(self, data):
+        if self._file is not None:
+            self._file.write(data)
+            return
+        self._chunks.append(data)
+        self._size += len(data)
+        if self._spill_threshold is not None and self._size > self._spill_threshold:
+            import tempfile
+            self._file = tempfile.TemporaryFile()
+            self._file.writelines(self._chunks)
+            self._chunks = None
+
+    def getraw(self, decode=True):
+        """Return the output as bytes or, if it was spilled, as a
+        SpilledOutput ("decode" determines what its lines will be).
+        """
+        if self._file is None:
+            return b"".join(self._chunks)
+        self._file.flush()
+        return SpilledOutput(self._file, decode)
+
+def _cmd_name(cmd):
+    # e.g. "git log" for ["/usr/bin/git", "log", "-1"]
+    name = os.path.basename(cmd[0])
+    return name + " " + cmd[1] if len(cmd) > 1 and not cmd[1].startswith("-") else name
+
+class CmdLatencies:
+    """Process wide record of the wall time taken by external commands
+    kept as a histogram per command name with power of two millisecond
+    buckets (bucket N holds times less than 2 ** N milliseconds).
+    Recording only happens while "enabled" is True.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, wall_time):
+        bucket = int(wall_time * 1000).bit_length()
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = {"count": 0, "total": 0.0, "max": 0.0, "buckets": collections.Counter()}
+            histogram["count"] += 1
+            histogram["total"] += wall_time
+            histogram["max"] = max(histogram["max"], wall_time)
+            histogram["buckets"][bucket] += 1
+
+    def percentile(self, name, percent):
+        """Return an upper bound (in seconds) for the given percentile of
+        the wall times recorded for "name" (or None if there are none).
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if not histogram:
+                return None
+            wanted = histogram["count"] * percent / 100.0
+            so_far = 0
+            for bucket in sorted(histogram["buckets"]):
+                so_far += histogram["buckets"][bucket]
+                if so_far >= wanted:
+                    return min(2 ** bucket / 1000.0, histogram["max"])
+            return histogram["max"]
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(hist, buckets=dict(hist["buckets"])) for name, hist in self._histograms.items()}
+
+    def clear(self):
+        with self._lock:
+            self._histograms = {}
+
+CMD_LATENCIES = CmdLatencies()
+
+def _with_stats(result, cmd, stats):
+    result.stats = stats
+    if CMD_LATENCIES.enabled:
+        CMD_LATENCIES.record(_cmd_name(cmd), stats.wall_time)
+    return result
+
+# Spawn backends.  On POSIX systems processes are normally started by
+# subprocess.Popen() but, as the cost of fork() grows with the size of
+# the parent, there are two alternatives: "posix_spawn" (which has vfork()
+# semantics so nothing is copied) and "forkserver" (a small helper
+# process started at first use that spawns processes on our behalf).
+# With either of these, only the child's stdio is inherited as Python's
+# file descriptors are close-on-exec by default.
+SPAWN_SUBPROCESS, SPAWN_POSIX_SPAWN, SPAWN_FORKSERVER = "subprocess", "posix_spawn", "forkserver"
+_SPAWN_BACKEND = SPAWN_SUBPROCESS
+
+# signals that Popen() restores to their default handlers in the child
+_SIGDEF = tuple(getattr(signal, name) for name in ("SIGPIPE", "SIGXFZ", "SIGXFSZ") if hasattr(signal, name))
+
+_RUsage = collections.namedtuple("_RUsage", ["ru_utime", "ru_stime", "ru_maxrss"])
+
+class _Wait4Mixin:
+    def wait4(self, deadline=None):
+        """Reap the process and return its resource usage (or None if it
+        had already been reaped elsewhere).  Raise subprocess.TimeoutExpired
+        if it hasn't exited by "deadline".
+        """
+        if self.returncode is not None:
+            return None
+        try:
+            if deadline is None:
+                _pid, status, rusage = os.wait4(self.pid, 0)
+            else:
+                delay = 0.001
+                while True:
+                    pid, status, rusage = os.wait4(self.pid, os.WNOHANG)
+                    if pid:
+                        break
+                    if time.monotonic() >= deadline:
+                        raise subprocess.TimeoutExpired(self.args, None)
+                    time.sleep(delay)
+                    delay = min(delay * 2, 0.05)
+        except ChildProcessError:
+            # this is what Popen() does in these circumstances
+            self.returncode = 0
+            return None
+        self.returncode = os.waitstatus_to_exitcode(status)
+        return rusage
+
+class _Popen(subprocess.Popen, _Wait4Mixin):
+    pass
+
+class _SpawnedProcess(_Wait4Mixin):
+    """Popen() work-alike for processes started by posix_spawn() or the
+    fork server.
+    """
+    def __init__(self, args, pid, stdin, stdout, stderr):
+        self.args = args
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+
+    def poll(self):
+        try:
+            self.wait4(time.monotonic())
+        except subprocess.TimeoutExpired:
+            pass
+        return self.returncode
+
+    def wait(self, timeout=None):
+        self.wait4(None if timeout is None else time.monotonic() + timeout)
+        return self.returncode
+
+    def kill(self):
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+# the return code given to a served process whose exit status was lost
+_UNKNOWN_EXIT_STATUS = 255
+
+class _ServedProcess(_SpawnedProcess):
+    """A process started by the fork server (which reaps it and reports
+    its exit status and resource usage via "status_sock").
+    """
+    def __init__(self, args, pid, stdin, stdout, stderr, status_sock):
+        _SpawnedProcess.__init__(self, args, pid, stdin, stdout, stderr)
+        self._status_sock = status_sock
+
+    def wait4(self, deadline=None):
+        import json
+        import socket
+        if self.returncode is not None:
+            return None
+        self._status_sock.settimeout(None if deadline is None else max(deadline - time.monotonic(), 0))
+        try:
+            data = self._status_sock.recv(4096)
+        except (socket.timeout, BlockingIOError):
+            # NB: a zero timeout makes the socket non-blocking
+            raise subprocess.TimeoutExpired(self.args, None)
+        self._status_sock.close()
+        if not data:
+            # the fork server died so we don't know how it ended and
+            # (unlike Popen()) we mustn't pretend that it succeeded
+            self.returncode = _UNKNOWN_EXIT_STATUS
+            return None
+        status, utime, stime, maxrss = json.loads(data.decode())
+        self.returncode = os.waitstatus_to_exitcode(status)
+        return _RUsage(utime, stime, maxrss)
+
+_FORK_SERVER_SCRIPT = """
+import json, os, signal, socket, threading
+SIGDEF = {sigdef!r}
+os.set_inheritable(3, False)
+ctl = socket.socket(fileno=3)
+def report(pid, status_sock):
+    _pid, status, rusage = os.wait4(pid, 0)
+    try:
+        status_sock.send(json.dumps([status, rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss]).encode())
+    except OSError:
+        pass
+    status_sock.close()
+while True:
+    msg, fds, _flags, _addr = socket.recv_fds(ctl, 16, 5)
+    if not msg:
+        break
+    # make received fds close-on-exec so the child only gets its stdio
+    # NB: we can't rely on recv_fds() to do it as it ignores its flags
+    for fd in fds:
+        os.set_inheritable(fd, False)
+    # the request is passed in a file as it may be too big for a message
+    with os.fdopen(fds[4], "rb") as request_file:
+        request_file.seek(0)
+        request = json.loads(request_file.read().decode())
+    status_sock = socket.socket(fileno=fds[3])
+    file_actions = [(os.POSIX_SPAWN_DUP2, fd, n) for n, fd in enumerate(fds[:3]) if fd != n]
+    try:
+        os.chdir(request["cwd"])
+        pid = os.posix_spawnp(request["args"][0], request["args"], request["env"], file_actions=file_actions,
+            setsid=request["setsid"], setsigdef=SIGDEF)
+    except OSError as edata:
+        status_sock.send(json.dumps([None, [edata.errno, edata.strerror]]).encode())
+        status_sock.close()
+    else:
+        status_sock.send(json.dumps([pid, None]).encode())
+        threading.Thread(target=report, args=(pid, status_sock), daemon=True).start()
+    for fd in fds[:3]:
+        os.close(fd)
+""".format(sigdef=tuple(int(sig) for sig in _SIGDEF))
+
+class _ForkServer:
+    def __init__(self):
+        self._ctl_sock = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        import socket
+        if self._pid is not None:
+            # reap the previous incarnation
+            try:
+                os.waitpid(self._pid, os.WNOHANG)
+            except ChildProcessError:
+                pass
+        ctl_sock, their_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        args = [sys.executable, "-I", "-S", "-c", _FORK_SERVER_SCRIPT]
+        file_actions = [(os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDWR, 0), (os.POSIX_SPAWN_DUP2, 0, 1),
+            (os.POSIX_SPAWN_DUP2, their_end.fileno(), 3)]
+        self._pid = os.posix_spawn(sys.executable, args, os.environ, file_actions=file_actions, setsigdef=_SIGDEF)
+        their_end.close()
+        self._ctl_sock = ctl_sock
+
+    @staticmethod
+    def _make_request_file(request):
+        # the arguments and environment may exceed the maximum message
+        # size (which is much less than ARG_MAX) so they're sent in a file
+        import json
+        data = json.dumps(request).encode()
+        if hasattr(os, "memfd_create"):
+            request_file = open(os.memfd_create("fork-server-request", os.MFD_CLOEXEC), "w+b")
+        else:
+            import tempfile
+            request_file = tempfile.TemporaryFile()
+        request_file.write(data)
+        request_file.flush()
+        return request_file
+
+    def spawn(self, args, fds, setsid):
+        """Spawn "args" with "fds" as its stdin, stdout and stderr and
+        return its pid and the socket on which its exit status will be
+        reported.
+        """
+        import json
+        import socket
+        status_sock, their_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        request_file = self._make_request_file({"args": args, "env": dict(os.environ), "cwd": os.getcwd(), "setsid": setsid})
+        try:
+            with self._lock:
+                # if the server has died try once to restart it
+                for attempt in range(2):
+                    if self._ctl_sock is None:
+                        self._start()
+                    try:
+                        socket.send_fds(self._ctl_sock, [b"spawn"], list(fds) + [their_end.fileno(), request_file.fileno()])
+                        break
+                    except OSError:
+                        self._ctl_sock.close()
+                        self._ctl_sock = None
+                        if attempt:
+                            raise
+        finally:
+            their_end.close()
+            request_file.close()
+        pid, error = json.loads(status_sock.recv(4096).decode())
+        if error:
+            status_sock.close()
+            raise OSError(*error)
+        return pid, status_sock
+
+_FORK_SERVER = _ForkServer()
+
+def set_spawn_backend(backend):
+    """Select the mechanism used to start external processes."""
+    global _SPAWN_BACKEND
+    assert backend in (SPAWN_SUBPROCESS, SPAWN_POSIX_SPAWN, SPAWN_FORKSERVER)
+    assert backend == SPAWN_SUBPROCESS or hasattr(os, "posix_spawnp")
+    _SPAWN_BACKEND = backend
+
+_BGND_PIDS = set()
+
+def _reap_bgnd_processes():
+    for pid in list(_BGND_PIDS):
+        try:
+            if os.waitpid(pid, os.WNOHANG)[0]:
+                _BGND_PIDS.discard(pid)
+        except ChildProcessError:
+            _BGND_PIDS.discard(pid)
+
+def _spawn(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, new_session=False):
+    """Start "cmd" using the selected backend and return a Popen() like
+    object with a wait4() method.  stdin, stdout and stderr may each be
+    subprocess.PIPE, subprocess.DEVNULL or None (inherit).
+    """
+    if _SPAWN_BACKEND == SPAWN_SUBPROCESS:
+        return _Popen(cmd, stdin=stdin, stdout=stdout, stderr=stderr, close_fds=IS_POSIX, bufsize=-1, start_new_session=new_session)
+    _reap_bgnd_processes()
+    child_fds = []
+    parent_files = []
+    try:
+        for n, (stdio, mode) in enumerate(((stdin, "wb"), (stdout, "rb"), (stderr, "rb"))):
+            if stdio == subprocess.PIPE:
+                read_fd, write_fd = os.pipe()
+                child_fd, parent_fd = (read_fd, write_fd) if n == 0 else (write_fd, read_fd)
+                child_fds.append(child_fd)
+                parent_files.append(open(parent_fd, mode))
+            else:
+                child_fds.append(os.open(os.devnull, os.O_RDWR) if stdio == subprocess.DEVNULL else os.dup(n))
+                parent_files.append(None)
+        if _SPAWN_BACKEND == SPAWN_FORKSERVER:
+            pid, status_sock = _FORK_SERVER.spawn(cmd, child_fds, new_session)
+            return _ServedProcess(cmd, pid, *parent_files, status_sock=status_sock)
+        file_actions = [(os.POSIX_SPAWN_DUP2, fd, n) for n, fd in enumerate(child_fds)]
+        pid = os.posix_spawnp(cmd[0], cmd, os.environ, file_actions=file_actions, setsid=new_session, setsigdef=_SIGDEF)
+        return _SpawnedProcess(cmd, pid, *parent_files)
+    except BaseException:
+        for parent_file in parent_files:
+            if parent_file is not None:
+                parent_file.close()
+        raise
+    finally:
+        for fd in child_fds:
+            os.close(fd)
+
+def _make_result(ecode, stdout, stderr, decode_stdout, lazy_decode):
+    # NB: by default decoding errors are raised here rather than when
+    # (possibly much later) the output is first used
+    result = CmdResult.undecoded(ecode, stdout, stderr, decode_stdout)
+    return result if lazy_decode else result.decoded()
+
 if IS_MSFT:
     startupinfo = subprocess.STARTUPINFO()
     startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-    def run_cmd(cmd, input_text=None, sanitize_stderr=None, decode_stdout=True):
+    def run_cmd(cmd, input_text=None, sanitize_stderr=None, decode_stdout=True, timeout=None, spill_threshold=None, lazy_decode=False):
         if isinstance(cmd, str):
             cmd = shlex.split(cmd)
+        start = time.monotonic()
         sub = subprocess.Popen(cmd,
             stdin=subprocess.PIPE, stdout=subprocess.PIPE,
             stderr=subprocess.PIPE, close_fds=IS_POSIX, bufsize=-1,
             startupinfo=startupinfo)
-        outd, errd = sub.communicate(input_text)
-        return CmdResult(ecode=sub.returncode, stdout=outd.decode() if decode_stdout else outd, stderr=errd.decode()).mapped_for_warning(sanitize_stderr=sanitize_stderr)
+        try:
+            outd, errd = sub.communicate(input_text, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            sub.kill()
+            outd, errd = sub.communicate()
+            errd += _("{0}: timed out after {1} seconds\n").format(cmd[0], timeout).encode()
+        sink = _OutputSink(spill_threshold)
+        sink.write(outd)
+        result = _make_result(sub.returncode, sink.getraw(decode_stdout), errd, decode_stdout, lazy_decode)
+        stats = CmdStats(sub.pid, time.monotonic() - start, None, None, None)
+        return _with_stats(result, cmd, stats).mapped_for_warning(sanitize_stderr=sanitize_stderr)
 
     def run_cmd_in_console(console, cmd, input_text=None, sanitize_stderr=None):
         if isinstance(cmd, str):
@@ -53,78 +571,99 @@ if IS_MSFT:
         console.end_cmd()
         return result.mapped_for_warning(sanitize_stderr=sanitize_stderr)
 else:
-    def run_cmd(cmd, input_text=None, sanitize_stderr=None, decode_stdout=True):
+    KILL_GRACE_TIME = 2.0
+
+    def _kill_and_reap(sub):
+        """Terminate the process group led by "sub" gracefully if possible
+        and forcibly if not.
+        """
+        for pipe in (sub.stdin, sub.stdout, sub.stderr):
+            pipe.close()
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(sub.pid, sig)
+            except ProcessLookupError:
+                pass
+            try:
+                return sub.wait4(None if sig == signal.SIGKILL else time.monotonic() + KILL_GRACE_TIME)
+            except subprocess.TimeoutExpired:
+                continue
+
+    def _make_stats(sub, start, rusage):
+        wall_time = time.monotonic() - start
+        if rusage is None:
+            return CmdStats(sub.pid, wall_time, None, None, None)
+        return CmdStats(sub.pid, wall_time, rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss)
+
+    def run_cmd(cmd, input_text=None, sanitize_stderr=None, decode_stdout=True, timeout=None, spill_threshold=None, lazy_decode=False):
+        """Run "cmd" and return a CmdResult.  If "spill_threshold" is
+        not None, stdout in excess of that many bytes is written to a
+        temporary file and returned as a SpilledOutput.  If "lazy_decode"
+        is True, decoding of the output is deferred until (and unless)
+        it's used (see CmdResult.undecoded()).
+        """
         if isinstance(cmd, str):
             cmd = shlex.split(cmd)
-        if IS_POSIX:
-            savedsh = signal.getsignal(signal.SIGPIPE)
-            signal.signal(signal.SIGPIPE, signal.SIG_DFL)
-        sub = subprocess.Popen(cmd,
-            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE, close_fds=IS_POSIX, bufsize=-1)
-        outd, errd = sub.communicate(input_text)
-        if IS_POSIX:
-            signal.signal(signal.SIGPIPE, savedsh)
-        return CmdResult(ecode=sub.returncode, stdout=outd.decode() if decode_stdout else outd, stderr=errd.decode()).mapped_for_warning(sanitize_stderr=sanitize_stderr)
+        start = time.monotonic()
+        # NB: the default SIGPIPE handler is restored in the child so we
+        # don't need to (and, if we want to be callable from other
+        # threads, can't) change our own handler around the call.
+        # Commands with a timeout get their own process group so that we
+        # can kill any children that they spawn along with them.
+        sub = _spawn(cmd, new_session=timeout is not None)
+        outd = _OutputSink(spill_threshold)
+        errd = []
+        try:
+            for is_stderr, data in _pump_output(sub, input_text, sep=None, timeout=timeout):
+                if is_stderr:
+                    errd.append(data)
+                else:
+                    outd.write(data)
+            rusage = sub.wait4(None if timeout is None else start + timeout)
+        except subprocess.TimeoutExpired:
+            rusage = _kill_and_reap(sub)
+            errd.append(_("{0}: timed out after {1} seconds\n").format(cmd[0], timeout).encode())
+        result = _make_result(sub.returncode, outd.getraw(decode_stdout), b"".join(errd), decode_stdout, lazy_decode)
+        return _with_stats(result, cmd, _make_stats(sub, start, rusage)).mapped_for_warning(sanitize_stderr=sanitize_stderr)
 
     def run_cmd_in_console(console, cmd, input_text=None, sanitize_stderr=None):
         from .utils import quote_if_needed
         if isinstance(cmd, str):
             cmd = shlex.split(cmd)
-        if IS_POSIX:
-            savedsh = signal.getsignal(signal.SIGPIPE)
-            signal.signal(signal.SIGPIPE, signal.SIG_DFL)
         console.start_cmd(" ".join((quote_if_needed(s) for s in cmd)) + "\n")
         try:
             # we need to catch OSError if command is unknown
-            sub = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE, close_fds=IS_POSIX, bufsize=-1)
+            start = time.monotonic()
+            sub = _spawn(cmd)
             if input_text is not None:
-                sub.stdin.write(input_text)
                 console.append_stdin(input_text)
-            sub.stdin.close()
-            stdout_eof = stderr_eof = False
-            outd = errd = ""
-            while True:
-                to_check_in = [sub.stdout] * (not stdout_eof) + \
-                              [sub.stderr] * (not stderr_eof)
-                ready = select.select(to_check_in, [], [], 0)
-                if sub.stdout in ready[0]:
-                    ochunk = sub.stdout.readline().decode()
-                    if ochunk == "":
-                        stdout_eof = True
-                    else:
-                        console.append_stdout(ochunk)
-                        outd += ochunk
-                if sub.stderr in ready[0]:
-                    echunk = sub.stderr.readline().decode()
-                    if echunk == "":
-                        stderr_eof = True
-                    else:
-                        console.append_stderr(echunk)
-                        errd += echunk
-                if stdout_eof and stderr_eof:
-                    break
-            sub.wait()
-            result = CmdResult(ecode=sub.returncode, stdout=outd, stderr=errd)
+            outd = []
+            errd = []
+            for is_stderr, data in _pump_output(sub, input_text):
+                text = data.decode()
+                if is_stderr:
+                    console.append_stderr(text)
+                    errd.append(text)
+                else:
+                    console.append_stdout(text)
+                    outd.append(text)
+            rusage = sub.wait4()
+            result = CmdResult(ecode=sub.returncode, stdout="".join(outd), stderr="".join(errd))
+            result = _with_stats(result, cmd, _make_stats(sub, start, rusage))
         except OSError as edata:
             emsg = "{0}: [Error {1}] {2}\n".format(cmd[0], edata.errno, edata.strerror)
             console.append_stderr(emsg)
             result = CmdResult(ecode=edata.errno, stdout="", stderr=emsg)
         console.end_cmd()
-        if IS_POSIX:
-            signal.signal(signal.SIGPIPE, savedsh)
         return result.mapped_for_warning(sanitize_stderr=sanitize_stderr)
 
-def run_get_cmd(cmd, input_text=None, sanitize_stderr=None, default=CmdFailure, do_rstrip=True, decode_stdout=True):
-    try:
-        result = run_cmd(cmd, input_text=input_text, sanitize_stderr=sanitize_stderr, decode_stdout=decode_stdout)
-    except UnicodeDecodeError:
-        if default is CmdFailure:
-            emsg = "{0}: generated invalid unicode text\n".format(cmd)
-            raise CmdFailure(emsg)
-        else:
-            return default
+def _invalid_unicode(cmd, default):
+    if default is CmdFailure:
+        emsg = "{0}: generated invalid unicode text\n".format(cmd)
+        raise CmdFailure(emsg)
+    return default
+
+def _get_output(result, default, do_rstrip, decode_stdout):
     if not result.is_ok:
         if default is CmdFailure:
             raise CmdFailure(result.message)
@@ -132,10 +671,503 @@ def run_get_cmd(cmd, input_text=None, sanitize_stderr=None, default=CmdFailure,
             return default
     return result.stdout.rstrip() if (decode_stdout and do_rstrip) else result.stdout
 
+def run_get_cmd(cmd, input_text=None, sanitize_stderr=None, default=CmdFailure, do_rstrip=True, decode_stdout=True, timeout=None):
+    try:
+        result = run_cmd(cmd, input_text=input_text, sanitize_stderr=sanitize_stderr, decode_stdout=decode_stdout, timeout=timeout)
+        return _get_output(result, default, do_rstrip, decode_stdout)
+    except UnicodeDecodeError:
+        return _invalid_unicode(cmd, default)
+
 def run_do_cmd(console, cmd, input_text=None, sanitize_stderr=None, suggestions=None):
     result = run_cmd_in_console(console=console, cmd=cmd, input_text=input_text, sanitize_stderr=sanitize_stderr)
     return result.mapped_for_suggestions(suggestions if suggestions else [])
 
+def _run_cmd_reporting_oserror(cmd, **kwargs):
+    try:
+        return run_cmd(cmd, **kwargs)
+    except OSError as edata:
+        emsg = "{0}: [Error {1}] {2}\n".format(cmd if isinstance(cmd, str) else cmd[0], edata.errno, edata.strerror)
+        return CmdResult.error(stderr=emsg)
+
+def iter_cmd_results(cmds, max_jobs=None, fail_fast=False, ordered=True, **kwargs):
+    """Run the commands in "cmds" concurrently (with at most "max_jobs"
+    running at any one time) and generate (index, CmdResult) pairs for
+    them in submission order or, if "ordered" is False, in the order
+    in which they complete.  If "fail_fast" is True then the first
+    command to fail causes those not yet started to be cancelled and the
+    generation stops at that point.  Keyword arguments are passed on
+    to run_cmd().
+    """
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_jobs or os.cpu_count()) as executor:
+        futures = [executor.submit(_run_cmd_reporting_oserror, cmd, **kwargs) for cmd in cmds]
+        index_for = {future: index for index, future in enumerate(futures)}
+        def cancel_on_error(future):
+            if not future.cancelled() and future.result().is_error:
+                for a_future in futures:
+                    a_future.cancel()
+        if fail_fast:
+            for future in futures:
+                future.add_done_callback(cancel_on_error)
+        try:
+            for future in (futures if ordered else concurrent.futures.as_completed(futures)):
+                if future.cancelled():
+                    break
+                result = future.result()
+                yield index_for[future], result
+                if fail_fast and result.is_error:
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+
+def run_cmds(cmds, max_jobs=None, fail_fast=False, **kwargs):
+    """Run the commands in "cmds" concurrently and return a list of
+    their CmdResults in submission order.  Entries for commands whose
+    results weren't collected (due to "fail_fast") are None.
+    """
+    cmds = list(cmds)
+    results = [None] * len(cmds)
+    for index, result in iter_cmd_results(cmds, max_jobs=max_jobs, fail_fast=fail_fast, ordered=False, **kwargs):
+        results[index] = result
+    return results
+
+# The space taken by an argument in the new process image is its length
+# plus its terminating NUL plus a pointer to it.  Leave some headroom
+# (as xargs does) for anything we haven't accounted for.
+_ARG_OVERHEAD = 1 + 8
+_ARG_MAX_HEADROOM = 2048
+
+def get_arg_max():
+    """Return the number of bytes available for a command's arguments."""
+    try:
+        arg_max = os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError, OSError):
+        # the limit on the length of a Windows command line
+        return 32767 - _ARG_MAX_HEADROOM
+    env_size = sum(len(os.fsencode(key)) + len(os.fsencode(value)) + 1 + _ARG_OVERHEAD for key, value in os.environ.items())
+    return arg_max - env_size - _ARG_MAX_HEADROOM
+
+def iter_arg_chunks(prefix, args, max_size=None):
+    """Generate commands consisting of "prefix" followed by as many of
+    "args" as will fit within "max_size" bytes (default: the system's
+    limit) in the manner of xargs.
+    """
+    limit = get_arg_max() if max_size is None else max_size
+    prefix = list(prefix)
+    prefix_size = sum(len(os.fsencode(arg)) + _ARG_OVERHEAD for arg in prefix)
+    chunk = []
+    size = prefix_size
+    for arg in args:
+        arg_size = len(os.fsencode(arg)) + _ARG_OVERHEAD
+        if chunk and size + arg_size > limit:
+            yield prefix + chunk
+            chunk = []
+            size = prefix_size
+        chunk.append(arg)
+        size += arg_size
+    if chunk:
+        yield prefix + chunk
+
+def run_cmd_chunked(prefix, args, max_jobs=1, fail_fast=False, suggestions=None, max_size=None, **kwargs):
+    """Run "prefix" with "args" spread over as few invocations as the
+    system's argument size limit allows (running up to "max_jobs" of them
+    at a time) and return a single CmdResult combining their output and
+    (after applying "suggestions" to each) their ecodes.  Keyword
+    arguments are passed on to run_cmd().  As for iter_cmd_results(),
+    failure to start a command gives an error result.
+    """
+    if isinstance(prefix, str):
+        prefix = shlex.split(prefix)
+    cmds = list(iter_arg_chunks(prefix, args, max_size))
+    if len(cmds) == 1:
+        results = [_run_cmd_reporting_oserror(cmds[0], **kwargs)]
+    else:
+        results = [result for _index, result in iter_cmd_results(cmds, max_jobs=max_jobs, fail_fast=fail_fast, **kwargs)]
+    return CmdResult.combine(result.mapped_for_suggestions(suggestions if suggestions else []) for result in results)
+
+class CmdOutputStream:
+    """Iterate over the records (lines by default) written to stdout by
+    "cmd" as they arrive without accumulating the whole output.  Records
+    are generated without their separator.  When the stream ends "result"
+    holds a CmdResult with the exit status and stderr (but no stdout).
+    """
+    def __init__(self, cmd, input_text=None, sep=b"\n", decode=True, sanitize_stderr=None):
+        self.cmd = shlex.split(cmd) if isinstance(cmd, str) else cmd
+        self.result = None
+        self._records = self._generate(input_text, sep, decode, sanitize_stderr)
+
+    def __iter__(self):
+        return self._records
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Abandon the stream (killing the command if it's still running)."""
+        self._records.close()
+
+    def _generate(self, input_text, sep, decode, sanitize_stderr):
+        if IS_MSFT:
+            result = run_cmd(self.cmd, input_text=input_text, decode_stdout=False)
+            records = result.stdout.split(sep)
+            if records[-1] == b"":
+                records.pop()
+            for record in records:
+                yield record.decode() if decode else record
+            self.result = CmdResult(result.ecode, "", result.stderr).mapped_for_warning(sanitize_stderr=sanitize_stderr)
+            return
+        sub = _spawn(self.cmd)
+        errd = []
+        finished = False
+        try:
+            for is_stderr, data in _pump_output(sub, input_text, sep):
+                if is_stderr:
+                    errd.append(data)
+                    continue
+                records = data.split(sep)
+                if records[-1] == b"":
+                    records.pop()
+                for record in records:
+                    yield record.decode() if decode else record
+            finished = True
+        finally:
+            if not finished and sub.poll() is None:
+                sub.kill()
+            sub.wait()
+        self.result = CmdResult(sub.returncode, "", b"".join(errd).decode()).mapped_for_warning(sanitize_stderr=sanitize_stderr)
+
+def iter_cmd_output(cmd, input_text=None, sep=b"\n", decode=True, sanitize_stderr=None):
+    """Return a CmdOutputStream for "cmd" e.g. use sep=b"\\0" for the
+    output of "git ls-files -z".
+    """
+    return CmdOutputStream(cmd, input_text=input_text, sep=sep, decode=decode, sanitize_stderr=sanitize_stderr)
+
+def _stat_signature(file_paths):
+    signature = []
+    for file_path in file_paths:
+        try:
+            stat_data = os.stat(file_path)
+            signature.append((stat_data.st_mtime_ns, stat_data.st_ino, stat_data.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+_CacheEntry = collections.namedtuple("_CacheEntry", ["result", "watch_paths", "signature", "events", "size"])
+
+class CmdCache:
+    """An opt in LRU cache for the results of read only commands (e.g.
+    "git rev-parse").  Results are keyed on the command, the current
+    working directory, the values of the nominated environment variables,
+    the input text and the "watch_paths" and "events".  A result is discarded when the mtime, inode or
+    size of any of its "watch_paths" changes or any of its "events" is
+    notified via enotify.
+    """
+    Stats = collections.namedtuple("Stats", ["hits", "misses", "evictions", "invalidations", "entries", "size"])
+
+    def __init__(self, max_entries=512, max_size=16 * 1024 * 1024):
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._keys_for_events = {}
+        self._cb_tokens = []
+        self._size = 0
+        self._hits = self._misses = self._evictions = self._invalidations = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return self.Stats(self._hits, self._misses, self._evictions, self._invalidations, len(self._entries), self._size)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+        if entry.events:
+            self._keys_for_events[entry.events].discard(key)
+
+    def _invalidate_events(self, events):
+        with self._lock:
+            keys = self._keys_for_events.get(events, ())
+            self._invalidations += len(keys)
+            for key in list(keys):
+                self._discard(key)
+
+    def _insert(self, key, entry):
+        if key in self._entries:
+            self._discard(key)
+        self._entries[key] = entry
+        self._size += entry.size
+        if entry.events:
+            if entry.events not in self._keys_for_events:
+                self._keys_for_events[entry.events] = set()
+                callback = lambda **kwargs: self._invalidate_events(entry.events)
+                # NB: invalidation mustn't be deferred by a dispatcher
+                self._cb_tokens.append(enotify.add_notification_cb(entry.events, callback, synchronous=True))
+            self._keys_for_events[entry.events].add(key)
+        while len(self._entries) > self._max_entries or self._size > self._max_size:
+            self._discard(next(iter(self._entries)))
+            self._evictions += 1
+
+    def run_cmd(self, cmd, input_text=None, sanitize_stderr=None, decode_stdout=True, watch_paths=(), events=0, env_keys=()):
+        if isinstance(cmd, str):
+            cmd = shlex.split(cmd)
+        environ = tuple((env_key, os.environ.get(env_key)) for env_key in env_keys)
+        watch_paths = tuple(watch_paths)
+        key = (tuple(cmd), os.getcwd(), environ, input_text, sanitize_stderr, decode_stdout, watch_paths, events)
+        signature = _stat_signature(watch_paths)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.signature == signature:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry.result
+                self._discard(key)
+                self._invalidations += 1
+            self._misses += 1
+        result = run_cmd(cmd, input_text=input_text, sanitize_stderr=sanitize_stderr, decode_stdout=decode_stdout)
+        entry = _CacheEntry(result, watch_paths, signature, events, len(result._raw(1)) + len(result._raw(2)))
+        with self._lock:
+            self._insert(key, entry)
+        return result
+
+    def run_get_cmd(self, cmd, input_text=None, sanitize_stderr=None, default=CmdFailure, do_rstrip=True, decode_stdout=True, watch_paths=(), events=0, env_keys=()):
+        try:
+            result = self.run_cmd(cmd, input_text=input_text, sanitize_stderr=sanitize_stderr, decode_stdout=decode_stdout,
+                watch_paths=watch_paths, events=events, env_keys=env_keys)
+            return _get_output(result, default, do_rstrip, decode_stdout)
+        except UnicodeDecodeError:
+            return _invalid_unicode(cmd, default)
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys_for_events = {}
+            self._size = 0
+            for cb_token in self._cb_tokens:
+                enotify.del_notification_cb(cb_token)
+            self._cb_tokens = []
+
+# Long lived helper processes that answer a stream of requests (e.g.
+# "git cat-file --batch") saving the cost of a process spawn per query.
+# The "read_response" framing functions take the helper's stdout and
+# return the bytes of one complete response raising EOFError if the
+# helper dies before completing it.
+def read_line_response(stdout):
+    """Read a response consisting of a single line."""
+    response = stdout.readline()
+    if not response.endswith(b"\n"):
+        raise EOFError
+    return response
+
+def read_sized_response(stdout):
+    """Read a response consisting of a header line whose last field is
+    the size of the content that follows it (plus a terminating newline)
+    as used by "git cat-file --batch".  A header without a size (e.g.
+    "<object> missing") constitutes the whole response.
+    """
+    header = read_line_response(stdout)
+    try:
+        size = int(header.split()[-1])
+    except (IndexError, ValueError):
+        return header
+    content = stdout.read(size + 1)
+    if len(content) < size + 1:
+        raise EOFError
+    return header + content
+
+class CoProcess:
+    """A helper process, started on first use, to which requests are
+    written (one per line) on its stdin and which writes its responses
+    to its stdout.  If the helper dies it is restarted.
+    """
+    def __init__(self, cmd, read_response=read_line_response, cwd=None):
+        self._cmd = shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
+        self._read_response = read_response
+        self._cwd = cwd
+        self._sub = None
+        self._stderr = None
+        self._lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def _start(self):
+        import tempfile
+        # use a file for stderr so that a chatty helper can't block on it
+        self._stderr = tempfile.TemporaryFile()
+        self._sub = subprocess.Popen(self._cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=self._stderr, cwd=self._cwd, close_fds=IS_POSIX, bufsize=-1)
+
+    def _stop(self):
+        if self._sub is None:
+            return ""
+        try:
+            self._sub.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._sub.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self._sub.kill()
+            self._sub.wait()
+        self._sub.stdout.close()
+        self._stderr.seek(0)
+        serr = self._stderr.read().decode(errors="replace")
+        self._stderr.close()
+        self._sub = self._stderr = None
+        return serr
+
+    def query(self, request, decode=True):
+        """Send "request" (str or bytes without a terminating newline) to
+        the helper and return its response as a CmdResult.
+        """
+        data = (request.encode() if isinstance(request, str) else request) + b"\n"
+        with self._lock:
+            serr = ""
+            # if the helper has died try once to restart it
+            for _attempt in range(2):
+                try:
+                    if self._sub is None:
+                        self._start()
+                    self._sub.stdin.write(data)
+                    self._sub.stdin.flush()
+                    response = self._read_response(self._sub.stdout)
+                    break
+                except (OSError, EOFError) as edata:
+                    serr = self._stop() or "{0}: {1}\n".format(self._cmd[0], str(edata) or _("helper process died"))
+            else:
+                return CmdResult.error(stderr=serr)
+            self.last_used = time.monotonic()
+        return CmdResult.ok(response.decode() if decode else response)
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+    def close_if_idle(self, idle_timeout):
+        with self._lock:
+            if self._sub is not None and time.monotonic() - self.last_used > idle_timeout:
+                self._stop()
+
+class CoProcessPool:
+    """A collection of CoProcesses running the same command, one for each
+    working directory in which it's been queried.  Helpers that have
+    been idle for longer than "idle_timeout" seconds are shut down (and
+    will be restarted when next needed).
+    """
+    def __init__(self, cmd, read_response=read_line_response, idle_timeout=300):
+        self._cmd = cmd
+        self._read_response = read_response
+        self._idle_timeout = idle_timeout
+        self._coprocs = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._reaper = None
+
+    def get(self, cwd=None):
+        cwd = os.path.abspath(cwd) if cwd else os.getcwd()
+        with self._lock:
+            coproc = self._coprocs.get(cwd)
+            if coproc is None:
+                coproc = self._coprocs[cwd] = CoProcess(self._cmd, self._read_response, cwd)
+            if self._reaper is None and self._idle_timeout:
+                self._closed.clear()
+                self._reaper = threading.Thread(target=self._reap_idle, daemon=True)
+                self._reaper.start()
+        return coproc
+
+    def query(self, request, cwd=None, decode=True):
+        return self.get(cwd).query(request, decode=decode)
+
+    def _reap_idle(self):
+        while not self._closed.wait(self._idle_timeout / 2):
+            with self._lock:
+                coprocs = list(self._coprocs.values())
+            for coproc in coprocs:
+                coproc.close_if_idle(self._idle_timeout)
+
+    def close(self):
+        with self._lock:
+            coprocs = list(self._coprocs.values())
+            self._coprocs = {}
+            self._reaper = None
+            self._closed.set()
+        for coproc in coprocs:
+            coproc.close()
+
+# Coroutine equivalents of the above for use with asyncio event loops
+_ASYNC_KWARGS = dict(startupinfo=startupinfo) if IS_MSFT else dict(close_fds=IS_POSIX)
+
+async def _create_subprocess(cmd):
+    import asyncio
+    return await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **_ASYNC_KWARGS)
+
+async def run_cmd_async(cmd, input_text=None, sanitize_stderr=None, decode_stdout=True, lazy_decode=False):
+    if isinstance(cmd, str):
+        cmd = shlex.split(cmd)
+    sub = await _create_subprocess(cmd)
+    outd, errd = await sub.communicate(input_text)
+    return _make_result(sub.returncode, outd, errd, decode_stdout, lazy_decode).mapped_for_warning(sanitize_stderr=sanitize_stderr)
+
+async def run_cmd_in_console_async(console, cmd, input_text=None, sanitize_stderr=None):
+    import asyncio
+    from .utils import quote_if_needed
+    if isinstance(cmd, str):
+        cmd = shlex.split(cmd)
+    console.start_cmd(" ".join((quote_if_needed(s) for s in cmd)) + "\n")
+    async def feed_stdin(stdin):
+        try:
+            if input_text:
+                stdin.write(input_text)
+                await stdin.drain()
+            stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    async def relay(stream, append):
+        buf = bytearray()
+        parts = []
+        while True:
+            chunk = await stream.read(_READ_SIZE)
+            buf += chunk
+            data = _take_records(buf, b"\n") if chunk else bytes(buf)
+            if data:
+                text = data.decode()
+                append(text)
+                parts.append(text)
+            if not chunk:
+                return "".join(parts)
+    try:
+        # we need to catch OSError if command is unknown
+        sub = await _create_subprocess(cmd)
+        if input_text is not None:
+            console.append_stdin(input_text)
+        _, outd, errd = await asyncio.gather(feed_stdin(sub.stdin),
+            relay(sub.stdout, console.append_stdout), relay(sub.stderr, console.append_stderr))
+        await sub.wait()
+        result = CmdResult(ecode=sub.returncode, stdout=outd, stderr=errd)
+    except OSError as edata:
+        emsg = "{0}: [Error {1}] {2}\n".format(cmd[0], edata.errno, edata.strerror)
+        console.append_stderr(emsg)
+        result = CmdResult(ecode=edata.errno, stdout="", stderr=emsg)
+    console.end_cmd()
+    return result.mapped_for_warning(sanitize_stderr=sanitize_stderr)
+
+async def run_get_cmd_async(cmd, input_text=None, sanitize_stderr=None, default=CmdFailure, do_rstrip=True, decode_stdout=True):
+    try:
+        result = await run_cmd_async(cmd, input_text=input_text, sanitize_stderr=sanitize_stderr, decode_stdout=decode_stdout)
+        return _get_output(result, default, do_rstrip, decode_stdout)
+    except UnicodeDecodeError:
+        return _invalid_unicode(cmd, default)
+
+async def run_do_cmd_async(console, cmd, input_text=None, sanitize_stderr=None, suggestions=None):
+    result = await run_cmd_in_console_async(console=console, cmd=cmd, input_text=input_text, sanitize_stderr=sanitize_stderr)
+    return result.mapped_for_suggestions(suggestions if suggestions else [])
+
 def run_cmd_in_bgnd(cmd):
     """Run the given command in the background.
     """
@@ -146,7 +1178,11 @@ def run_cmd_in_bgnd(cmd):
     if IS_MSFT:
         pid = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, startupinfo=startupinfo).pid
     else:
-        pid = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).pid
+        sub = _spawn(cmd, stdin=None, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        pid = sub.pid
+        if _SPAWN_BACKEND == SPAWN_POSIX_SPAWN:
+            # nobody else will reap it
+            _BGND_PIDS.add(pid)
     if not pid:
         return False
     return pid